@@ -0,0 +1,503 @@
+#!/usr/bin/env python
+"""Benchmarks for loading and using synthetic plugin namespaces.
+
+Run ``python benchmarks.py`` to run all of them, or name the ones to run.
+Each benchmark runs once for every size given with ``--sizes``, and the
+results can be written as JSON with ``--json`` to compare between commits.
+"""
+
+import argparse
+import gc
+import importlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from straight.plugin import loaders, workers
+
+PLUGIN = """\
+def do(x):
+    return x + 1
+
+
+def filter(x):
+    return x + 1
+"""
+
+# Spends its import time outside of the GIL, like reading files or
+# initialising C extensions would.
+SLOW_IMPORT = """\
+import time
+time.sleep(0.002)
+
+
+def do(x):
+    return x + 1
+"""
+
+# The priority is only known once the module runs
+SLOW_IMPORT_META = """\
+import time
+time.sleep(0.002)
+
+
+class __plugin__(object):
+    priority = int(__name__[-1])
+
+
+def do(x):
+    return x + 1
+"""
+
+IMPLYING = """\
+class __plugin__:
+    imply_plugins = (%r,)
+
+
+def do(x):
+    return x + 1
+"""
+
+# Re-exports a library, as plugins doing ``from lib import *`` do
+CLASSES = """\
+from typing import *
+
+from bench_base import Base
+
+
+"""
+
+CLASS = """\
+class Plugin%d(Base):
+    def do(self, x):
+        return x + 1
+
+
+class Helper%d(object):
+    pass
+
+
+"""
+
+CPU_BOUND = """\
+def work(n):
+    return sum(i * i for i in range(n))
+"""
+
+EXTEND_PATH = """\
+from pkgutil import extend_path
+
+__path__ = extend_path(__path__, __name__)
+"""
+
+
+def write(path, source):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, "w") as f:
+        f.write(source)
+
+
+def make_namespace(root, namespace, count, body, init=""):
+    """Write ``count`` plugin modules into a namespace package under ``root``."""
+
+    path = os.path.join(root, *namespace.split("."))
+    write(os.path.join(path, "__init__.py"), init)
+    for i in range(count):
+        write(os.path.join(path, "plugin_%05d.py" % i), body)
+    return path
+
+
+def forget(namespace):
+    for modname in list(sys.modules):
+        if modname == namespace or modname.startswith(namespace + "."):
+            del sys.modules[modname]
+    importlib.invalidate_caches()
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def rate(func, seconds=0.2):
+    """How many times per second can ``func`` be called?"""
+
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < seconds:
+        for _ in range(10):
+            func()
+        calls += 10
+        elapsed = time.perf_counter() - start
+    return calls / elapsed
+
+
+def measure_load(namespace, make_loader, **load_kwargs):
+    """Time discovery and loading of a namespace, and the memory used."""
+
+    forget(namespace)
+    finder = make_loader()
+    finder = getattr(finder, "module_loader", finder)
+    discovery, filepaths = timed(lambda: list(finder._findPluginFilePaths(namespace)))
+
+    forget(namespace)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        load, plugins = timed(make_loader().load, namespace, **load_kwargs)
+        memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    # Without tracing, which slows importing down a lot
+    forget(namespace)
+    load, plugins = timed(make_loader().load, namespace, **load_kwargs)
+
+    return plugins, {
+        "found": len(filepaths),
+        "plugins": len(plugins),
+        "discovery_s": discovery,
+        "load_s": load,
+        "peak_memory_bytes": memory,
+    }
+
+
+def bench_flat(root, size):
+    """A single namespace package of plugin modules, and dispatch over them."""
+
+    make_namespace(root, "bench_flat", size, PLUGIN)
+    plugins, result = measure_load("bench_flat", loaders.ModuleLoader)
+
+    result["call_per_s"] = rate(lambda: list(plugins.call("do", 1)))
+    result["first_per_s"] = rate(lambda: plugins.first("do", 1))
+    result["pipe_per_s"] = rate(lambda: plugins.pipe("filter", 1))
+    result["pipe_stream_items_per_s"] = 1000 * rate(
+        lambda: list(plugins.pipe_stream("filter", range(1000)))
+    )
+
+    result["implementing_per_s"] = rate(lambda: plugins.implementing("do"))
+
+    hook = plugins.hook("do")
+    result["hook_call_per_s"] = rate(lambda: hook(1))
+    result["hook_first_per_s"] = rate(lambda: hook.first(1))
+    result["hook_pipe_per_s"] = rate(lambda: plugins.hook("filter").pipe(1))
+    return result
+
+
+def bench_deep(root, size, depth=10):
+    """Plugins spread through nested packages, loaded with ``recurse=True``."""
+
+    per_level = max(1, size // depth)
+    namespace = "bench_deep"
+    for level in range(depth):
+        make_namespace(root, namespace, per_level, PLUGIN)
+        namespace += ".sub"
+    return measure_load("bench_deep", lambda: loaders.ModuleLoader(recurse=True))[1]
+
+
+def bench_paths(root, size, entries=50):
+    """A namespace split over many ``sys.path`` entries."""
+
+    entries = min(size, entries)
+    paths = [os.path.join(root, "path_%03d" % i) for i in range(entries)]
+    for i, path in enumerate(paths):
+        make_namespace(path, "bench_paths", 0, "", EXTEND_PATH)
+        for j in range(i, size, entries):
+            write(os.path.join(path, "bench_paths", "plugin_%05d.py" % j), PLUGIN)
+
+    sys.path.extend(paths)
+    try:
+        return measure_load("bench_paths", loaders.ModuleLoader)[1]
+    finally:
+        del sys.path[-entries:]
+
+
+def bench_imply_deep(root, size, length=20):
+    """Namespaces of plugins, each implying the next in a chain, and the
+    last implying the first.
+    """
+
+    length = min(size, length)
+    per_namespace = max(1, size // length)
+    for i in range(length):
+        namespace = "bench_imply_%03d" % i
+        make_namespace(root, namespace, per_namespace - 1, PLUGIN)
+        body = IMPLYING % ("bench_imply_%03d" % ((i + 1) % length))
+        write(os.path.join(root, namespace, "implying.py"), body)
+
+    return measure_load("bench_imply_000", loaders.ModuleLoader)[1]
+
+
+def bench_imply_wide(root, size, width=50):
+    """A namespace implying many others, which all imply a common one."""
+
+    width = min(size, width)
+    per_namespace = max(1, size // (width + 1))
+    make_namespace(root, "bench_wide_common", per_namespace, PLUGIN)
+    implied = []
+    for i in range(width):
+        namespace = "bench_wide_%03d" % i
+        implied.append(namespace)
+        make_namespace(root, namespace, per_namespace - 1, PLUGIN)
+        body = IMPLYING % "bench_wide_common"
+        write(os.path.join(root, namespace, "implying.py"), body)
+
+    make_namespace(root, "bench_wide", 0, "")
+    body = "class __plugin__:\n    imply_plugins = %r\n" % (tuple(implied),)
+    write(os.path.join(root, "bench_wide", "implying.py"), body)
+
+    return measure_load("bench_wide", loaders.ModuleLoader)[1]
+
+
+def bench_classes(root, size, per_module=10):
+    """Modules defining many classes, loaded with ``ClassLoader``."""
+
+    write(os.path.join(root, "bench_base.py"), "class Base(object):\n    pass\n")
+    body = CLASSES + "".join(CLASS % (i, i) for i in range(per_module))
+    make_namespace(root, "bench_classes", max(1, size // per_module), body)
+
+    base = importlib.import_module("bench_base")
+    try:
+        plugins, result = measure_load(
+            "bench_classes", loaders.ClassLoader, subclasses=base.Base
+        )
+        forget("bench_classes")
+        result["local_only_load_s"], local = timed(
+            loaders.ClassLoader(local_only=True).load,
+            "bench_classes",
+            subclasses=base.Base,
+        )
+    finally:
+        forget("bench_base")
+    assert len(local) == len(plugins), "local_only found other classes"
+    result["produce_per_s"] = rate(plugins.produce)
+    return result
+
+
+def bench_parallel_import(root, size, workers=8):
+    """Import a namespace of slow modules serially and with a thread pool."""
+
+    namespace = "bench_parallel"
+    make_namespace(root, namespace, size, SLOW_IMPORT)
+
+    result = {}
+    names = {}
+    for label, n in (("serial", None), ("parallel", workers)):
+        forget(namespace)
+        elapsed, plugins = timed(loaders.ModuleLoader(workers=n).load, namespace)
+        result["%s_s" % label] = elapsed
+        names[label] = [p.__name__ for p in plugins]
+
+    assert names["serial"] == names["parallel"], "parallel import changed the order"
+    result["workers"] = workers
+    result["speedup"] = result["serial_s"] / result["parallel_s"]
+    return result
+
+
+def bench_parallel_meta(root, size, workers=8):
+    """Import slow modules whose ``__plugin__`` has to be run, serially and
+    with a thread pool.
+    """
+
+    namespace = "bench_parallel_meta"
+    make_namespace(root, namespace, size, SLOW_IMPORT_META)
+
+    result = {}
+    names = {}
+    for label, n in (("serial", None), ("parallel", workers)):
+        forget(namespace)
+        elapsed, plugins = timed(loaders.ModuleLoader(workers=n).load, namespace)
+        result["%s_s" % label] = elapsed
+        names[label] = [p.__name__ for p in plugins]
+
+    assert names["serial"] == names["parallel"], "parallel import changed the order"
+    result["workers"] = workers
+    result["speedup"] = result["serial_s"] / result["parallel_s"]
+    return result
+
+
+def bench_frozen(root, size):
+    """Loading a namespace by discovery and from a frozen registry."""
+
+    make_namespace(root, "bench_frozen", size, PLUGIN)
+    loaders.freeze("bench_frozen", path=os.path.join(root, "bench_registry.py"))
+
+    result = {}
+    try:
+        for label, registry in (("discovery", None), ("frozen", "bench_registry")):
+            loaders.load_registry(registry)
+            for lazy in (False, True):
+                forget("bench_frozen")
+                name = "%s_lazy_s" % label if lazy else "%s_s" % label
+                result[name] = timed(loaders.unified_load, "bench_frozen", lazy=lazy)[0]
+    finally:
+        loaders.load_registry(None)
+    return result
+
+
+def bench_unload(root, size):
+    """Memory held by a loaded namespace, and how much unloading frees."""
+
+    make_namespace(root, "bench_unload", size, PLUGIN)
+    forget("bench_unload")
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        plugins = loaders.ModuleLoader().load("bench_unload")
+        loaded = tracemalloc.get_traced_memory()[0] - start
+        elapsed, report = timed(plugins.unload)
+    finally:
+        tracemalloc.stop()
+    return {
+        "loaded_bytes": loaded,
+        "reclaimed_bytes": report["memory"],
+        "modules": len(report["modules"]),
+        "unload_s": elapsed,
+    }
+
+
+def bench_processes(root, size, processes=4, n=2000):
+    """CPU-bound plugins called in the host process and in worker processes."""
+
+    make_namespace(root, "bench_processes", size, CPU_BOUND)
+    plugins = loaders.ModuleLoader().load("bench_processes")
+    result = {"processes": processes}
+    result["in_process_s"], expected = timed(lambda: list(plugins.call("work", n)))
+
+    start, hosted = timed(workers.ProcessPluginManager, "bench_processes", processes)
+    with hosted:
+        result["start_s"] = start
+        result["workers_s"], found = timed(lambda: list(hosted.call("work", n)))
+    assert found == expected, "worker processes gave other results"
+    result["speedup"] = result["in_process_s"] / result["workers_s"]
+    return result
+
+
+def bench_context(root, size, namespaces=25):
+    """Many namespaces loaded as modules and as classes, with and without a
+    shared ``DiscoveryContext``.
+    """
+
+    namespaces = ["bench_context_%02d" % i for i in range(min(size, namespaces))]
+    for namespace in namespaces:
+        make_namespace(root, namespace, max(1, size // len(namespaces)), PLUGIN)
+
+    def load_all(context):
+        for namespace in namespaces:
+            loaders.ModuleLoader(context=context).load(namespace)
+            loaders.ObjectLoader(context=context).load(namespace)
+            loaders.ModuleLoader(recurse=True, context=context).load(namespace)
+
+    result = {"namespaces": len(namespaces)}
+    for label, context in (("separate", None), ("shared", loaders.DiscoveryContext())):
+        for namespace in namespaces:
+            forget(namespace)
+        result["%s_s" % label] = timed(load_all, context)[0]
+    return result
+
+
+BENCHMARKS = {
+    "flat": bench_flat,
+    "deep": bench_deep,
+    "paths": bench_paths,
+    "imply_deep": bench_imply_deep,
+    "imply_wide": bench_imply_wide,
+    "classes": bench_classes,
+    "parallel_import": bench_parallel_import,
+    "parallel_meta": bench_parallel_meta,
+    "context": bench_context,
+    "frozen": bench_frozen,
+    "unload": bench_unload,
+    "processes": bench_processes,
+}
+
+
+def commit():
+    try:
+        output = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode().strip()
+
+
+def run(name, size):
+    root = tempfile.mkdtemp()
+    sys.path.insert(0, root)
+    try:
+        result = BENCHMARKS[name](root, size)
+    except Exception as e:
+        # Recorded, so that a failure shows up when comparing results
+        result = {"error": "%s: %s" % (type(e).__name__, e)}
+    finally:
+        sys.path.remove(root)
+        shutil.rmtree(root)
+        for modname in list(sys.modules):
+            if modname.startswith("bench_"):
+                del sys.modules[modname]
+    return dict(benchmark=name, size=size, **result)
+
+
+def format_result(result):
+    fields = []
+    for key, value in result.items():
+        if key in ("benchmark", "size"):
+            continue
+        if isinstance(value, float):
+            fields.append("%s=%.4g" % (key, value))
+        else:
+            fields.append("%s=%s" % (key, value))
+    return "  ".join(fields)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark")
+    parser.add_argument(
+        "--sizes",
+        default="10,100,1000",
+        help="comma separated numbers of plugin modules, default %(default)s",
+    )
+    parser.add_argument("--json", metavar="FILE", help="write the results to FILE")
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark %r" % name)
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    results = []
+    for name in args.benchmarks or list(BENCHMARKS):
+        for size in sizes:
+            result = run(name, size)
+            results.append(result)
+            print("%-16s %6d  %s" % (name, size, format_result(result)))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "commit": commit(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
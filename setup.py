@@ -13,9 +13,10 @@ setup(
     url="https://github.com/ironfroggy/straight.plugin",
     packages=find_packages(),
     namespace_packages=["straight"],
+    python_requires=">=3.6",
     classifiers=[
-        "Programming Language :: Python :: 2",
         "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3 :: Only",
         "Environment :: Plugins",
     ],
 )
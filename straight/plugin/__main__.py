@@ -0,0 +1,32 @@
+"""Command line tools, run as ``python -m straight.plugin``."""
+
+import argparse
+import sys
+
+from straight.plugin import loaders
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m straight.plugin")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    freeze = commands.add_parser(
+        "freeze", help="write a registry module of the plugins of some namespaces"
+    )
+    freeze.add_argument("namespaces", nargs="+", metavar="namespace")
+    freeze.add_argument(
+        "--recurse", action="store_true", help="include plugins in sub-packages"
+    )
+    freeze.add_argument(
+        "-o", "--output", metavar="FILE", help="write to FILE instead of stdout"
+    )
+
+    args = parser.parse_args(argv)
+    source = loaders.freeze(args.namespaces, recurse=args.recurse, path=args.output)
+    if args.output is None:
+        sys.stdout.write(source)
+
+
+if __name__ == "__main__":
+    main()
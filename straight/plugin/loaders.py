@@ -1,11 +1,36 @@
 """Facility to load plugins."""
 
+import ast
+import gc
+import json
 import os
+import stat
 import sys
+import tempfile
+import threading
+import time
+import traceback
+import tracemalloc
+import zipfile
 
-from functools import lru_cache
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
 from imp import find_module
-from importlib import import_module
+from importlib import import_module, invalidate_caches
+from importlib import reload as reload_module
+from importlib.util import find_spec
+
+try:
+    from importlib.resources import files as resource_files
+except ImportError:
+    resource_files = None
+
+try:
+    from importlib import metadata
+except ImportError:
+    metadata = None
+from types import ModuleType, SimpleNamespace
 
 from straight.plugin.manager import PluginManager
 
@@ -16,41 +41,749 @@ def unique_list(seq):
     return [x for x in seq if not (x in seen or seen_add(x))]
 
 
+# Returned by read_static_meta() when only importing the module can tell.
+DYNAMIC = object()
+
+# The kinds of entries found when scanning a namespace directory
+MODULE = "module"
+PACKAGE = "package"
+DIRECTORY = "directory"
+
+_STATIC_META_KEYS = ("priority", "load", "imply_plugins")
+_static_meta_cache = {}
+
+
+def _package_name(name):
+    """Whether a directory could be a package, unlike ``__pycache__``."""
+
+    return name.isidentifier() and name != "__pycache__"
+
+
+def _patterns(patterns):
+    """Module name patterns as a tuple, or None to not filter by them."""
+
+    if patterns is None:
+        return None
+    if isinstance(patterns, str):
+        return (patterns,)
+    return tuple(patterns)
+
+
+def _binds(node, name):
+    """Find the nodes binding ``name`` in the scope of the given statements."""
+
+    if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+        if node.name == name:
+            yield node
+        # A nested scope can only rebind the module's name through ``global``
+        for sub in ast.walk(node):
+            if isinstance(sub, ast.Global) and name in sub.names:
+                yield sub
+        return
+    if isinstance(node, ast.Name) and node.id == name:
+        if not isinstance(node.ctx, ast.Load):
+            yield node
+    elif isinstance(node, ast.alias):
+        if (node.asname or node.name.split(".")[0]) == name:
+            yield node
+    for child in ast.iter_child_nodes(node):
+        for found in _binds(child, name):
+            yield found
+
+
+def _mentions(node, name):
+    """Whether ``name`` is used in the given statement, as a variable, an
+    attribute or a string, such as by ``setattr(__plugin__, ...)``.
+    """
+
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.Name) and sub.id == name:
+            return True
+        if isinstance(sub, ast.Attribute) and sub.attr == name:
+            return True
+        if isinstance(sub, ast.Constant):
+            if sub.value == name:
+                return True
+        elif type(sub).__name__ == "Str" and sub.s == name:
+            # Python < 3.8
+            return True
+    return False
+
+
+def _literal_meta(classdef):
+    bases = classdef.bases
+    if len(bases) == 1 and isinstance(bases[0], ast.Name):
+        # ``class __plugin__(object):`` is as plain as no bases at all
+        if bases[0].id == "object":
+            bases = []
+    if bases or classdef.keywords or classdef.decorator_list:
+        return DYNAMIC
+    values = {}
+    for stmt in classdef.body:
+        if isinstance(stmt, ast.Assign):
+            targets, value = stmt.targets, stmt.value
+        elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+            targets, value = [stmt.target], stmt.value
+        else:
+            targets, value = [stmt], None
+        for target in targets:
+            if isinstance(target, ast.Name) and value is not None:
+                if target.id in _STATIC_META_KEYS:
+                    try:
+                        values[target.id] = ast.literal_eval(value)
+                    except ValueError:
+                        return DYNAMIC
+                continue
+            for key in _STATIC_META_KEYS:
+                if any(_binds(target, key)):
+                    return DYNAMIC
+    return SimpleNamespace(**values)
+
+
+def read_static_meta(path):
+    """Read the ``__plugin__`` settings of a plugin module without importing it.
+
+    Returns ``None`` if the module does not define ``__plugin__`` and an object
+    holding the literal ``priority``, ``load`` and ``imply_plugins`` values if
+    it is a plain class, which the rest of the module does not refer to. If the
+    values can only be known by running the module, ``DYNAMIC`` is returned
+    instead.
+    """
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return DYNAMIC
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _static_meta_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    try:
+        with open(path, "rb") as f:
+            source = f.read()
+        if b"__plugin__" not in source:
+            meta = None
+        else:
+            tree = ast.parse(source, path)
+            bindings = [n for n in tree.body for n in _binds(n, "__plugin__")]
+            if not bindings:
+                meta = None
+            elif len(bindings) == 1 and bindings[0] in tree.body:
+                others = [n for n in tree.body if n is not bindings[0]]
+                if not isinstance(bindings[0], ast.ClassDef):
+                    meta = DYNAMIC
+                elif any(_mentions(n, "__plugin__") for n in others):
+                    # Possibly changed after it is defined
+                    meta = DYNAMIC
+                else:
+                    meta = _literal_meta(bindings[0])
+            else:
+                meta = DYNAMIC
+    except (OSError, SyntaxError, ValueError):
+        meta = DYNAMIC
+
+    _static_meta_cache[path] = (key, meta)
+    return meta
+
+
+_zip_indexes = {}
+
+
+def _zip_index(archive):
+    """Map each directory inside a zip archive to its ``(name, kind)`` listing.
+
+    The central directory is read once per archive, and read again only if
+    the archive file changes.
+    """
+
+    st = os.stat(archive)
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _zip_indexes.get(archive)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with zipfile.ZipFile(archive) as zf:
+        names = zf.namelist()
+    files = set(name for name in names if not name.endswith("/"))
+    children = {}
+    for name in names:
+        parts = name.rstrip("/").split("/")
+        for depth in range(len(parts)):
+            parent = "/".join(parts[:depth])
+            children.setdefault(parent, {})
+            if depth < len(parts) - 1 or name.endswith("/"):
+                children[parent][parts[depth]] = None
+            elif parts[depth].endswith(".py") and parts[depth] != "__init__.py":
+                children[parent].setdefault(parts[depth], MODULE)
+
+    index = {}
+    for parent, entries in children.items():
+        listing = []
+        for child, kind in sorted(entries.items()):
+            if kind is None:
+                if not _package_name(child):
+                    continue
+                path = "/".join(p for p in (parent, child, "__init__.py") if p)
+                kind = PACKAGE if path in files else DIRECTORY
+            listing.append((child, kind))
+        index[parent] = listing
+
+    _zip_indexes[archive] = (key, index)
+    return index
+
+
+def zip_listing(path):
+    """List a directory inside a zip archive, such as a zipapp or an egg,
+    as ``(name, kind)`` pairs.
+
+    Raises ``FileNotFoundError`` if the path is not inside an archive.
+    """
+
+    archive, inner = path, []
+    while not os.path.isfile(archive):
+        archive, tail = os.path.split(archive)
+        if not tail:
+            raise FileNotFoundError(path)
+        inner.insert(0, tail)
+    try:
+        index = _zip_index(archive)
+    except (OSError, zipfile.BadZipFile):
+        raise FileNotFoundError(path)
+    try:
+        return index["/".join(inner)]
+    except KeyError:
+        raise FileNotFoundError(path)
+
+
+_entry_point_index = None
+
+
+def _site_fingerprint():
+    """Identify the installed distributions by the state of the directories
+    on ``sys.path``. Installing or removing a distribution changes the
+    modification time of the directory its metadata is in.
+    """
+
+    fingerprint = []
+    for path in unique_list(sys.path):
+        try:
+            st = os.stat(path or ".")
+        except OSError:
+            continue
+        if stat.S_ISDIR(st.st_mode):
+            fingerprint.append((path, st.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+def entry_point_index(index=None):
+    """Map each entry point group to its ``(name, value)`` entry points.
+
+    Reading the metadata of every installed distribution is slow, so the
+    result is kept until ``sys.path`` or one of its directories changes. It is
+    also recorded in ``index``, a ``DiscoveryIndex``, if one is given.
+    """
+
+    global _entry_point_index
+
+    fingerprint = _site_fingerprint()
+    if _entry_point_index is not None and _entry_point_index[0] == fingerprint:
+        return _entry_point_index[1]
+
+    groups = index.entry_points(fingerprint) if index is not None else None
+    if groups is None:
+        groups = {}
+        if metadata is not None:
+            for dist in metadata.distributions():
+                for ep in dist.entry_points:
+                    entry = (ep.name, ep.value)
+                    group = groups.setdefault(ep.group, [])
+                    if entry not in group:
+                        group.append(entry)
+        if index is not None:
+            index.set_entry_points(fingerprint, groups)
+
+    _entry_point_index = (fingerprint, groups)
+    return groups
+
+
+def _snapshot(origin):
+    """Record the state of a plugin's file, to tell when it has changed.
+
+    A plugin inside a zip archive changes along with the archive. Plugins
+    without a file, or whose file is gone, have no snapshot.
+    """
+
+    if origin is None:
+        return None
+    path = origin
+    while True:
+        try:
+            st = os.stat(path)
+            break
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+    if path != origin and not stat.S_ISREG(st.st_mode):
+        # A directory, the plugin itself is missing
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+ImportFailure = namedtuple("ImportFailure", "module origin error traceback")
+
+
+class PluginImportError(ImportError):
+    """Raised by strict loaders when plugins failed to import. The failures
+    are in ``errors``, as ``ImportFailure`` tuples.
+    """
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        names = ", ".join(failure.module for failure in self.errors)
+        super(PluginImportError, self).__init__(
+            "%d plugins failed to import: %s" % (len(self.errors), names)
+        )
+
+
+# What a plugin raises when it cannot be imported, including one edited
+# into invalid code
+_IMPORT_ERRORS = (ImportError, SyntaxError)
+
+# Plugin files which failed to import, with the snapshot of the file when
+# they did, so they are not imported again until they change.
+_failed_imports = {}
+
+
+def _failed_import(origin, snapshot=None):
+    """The ``ImportFailure`` of a file which has not changed since, if any."""
+
+    entry = _failed_imports.get(origin)
+    if entry is None:
+        return None
+    if snapshot is None:
+        snapshot = _snapshot(origin)
+    if entry[0] != snapshot:
+        return None
+    return entry[1]
+
+
+def clear_import_failures():
+    """Forget which plugins failed to import, so they are tried again by the
+    next load even if their files have not changed. ``Loader.unload()``
+    forgets the failures of the plugins it unloads.
+    """
+
+    _failed_imports.clear()
+
+
+def _import_failure(name, origin, error):
+    failure = _failed_imports.get(origin, (None, None))[1]
+    if failure is not None and failure.error is error:
+        return failure
+    lines = traceback.format_exception(type(error), error, error.__traceback__)
+    return ImportFailure(name, origin, error, "".join(lines))
+
+
+def _may_extend_path(origin):
+    """Could the package ``__init__`` at origin change its own ``__path__``?"""
+
+    if not origin.endswith(".py"):
+        return True
+    try:
+        with open(origin, "rb") as f:
+            return b"__path__" in f.read()
+    except OSError:
+        return True
+
+
+def _remove_module(name):
+    """Remove a module from ``sys.modules`` and from its parent package."""
+
+    module = sys.modules.pop(name)
+    parent, _, child = name.rpartition(".")
+    if getattr(sys.modules.get(parent), child, None) is module:
+        delattr(sys.modules[parent], child)
+
+
+class LazyModule(object):
+    """A stand-in for a plugin module which is only imported the first time
+    one of its attributes is used.
+
+    A module which fails to import has no attributes, like a plugin without
+    the methods asked for, and its ``ImportFailure`` is added to the
+    ``errors`` of the plugin manager it was loaded into.
+    """
+
+    __slots__ = (
+        "_lazy_name",
+        "_lazy_origin",
+        "_lazy_module",
+        "_lazy_handle",
+        "_lazy_collector",
+        "_lazy_errors",
+    )
+
+    def __init__(self, name, origin=None):
+        self._lazy_name = name
+        self._lazy_origin = origin
+        self._lazy_module = None
+        self._lazy_handle = None
+        self._lazy_collector = None
+        self._lazy_errors = None
+
+    def _lazy_bind(self, collector, errors):
+        """A handle on the same module for one loader, which imports it with
+        the loader's collector and adds its failure to the loader's errors.
+        """
+
+        bound = LazyModule(self._lazy_name, self._lazy_origin)
+        bound._lazy_handle = self
+        bound._lazy_collector = collector
+        bound._lazy_errors = errors
+        return bound
+
+    @property
+    def loaded(self):
+        if self._lazy_handle is not None:
+            return self._lazy_handle.loaded
+        return self._lazy_module is not None
+
+    def _lazy_load(self, collector=None):
+        if self._lazy_handle is not None:
+            return self._lazy_handle._lazy_load(self._lazy_collector)
+        if self._lazy_module is None:
+            origin = self._lazy_origin
+            if origin in _failed_imports:
+                failure = _failed_import(origin)
+                if failure is not None:
+                    if collector is not None:
+                        collector.failed(self._lazy_name, failure.error)
+                    raise failure.error.with_traceback(None)
+            try:
+                if collector is None:
+                    self._lazy_module = import_module(self._lazy_name)
+                else:
+                    self._lazy_module = collector.import_module(self._lazy_name)
+            except _IMPORT_ERRORS as e:
+                snapshot = _snapshot(origin)
+                # Without a snapshot, a fixed plugin could not be told apart
+                if snapshot is not None:
+                    failure = _import_failure(self._lazy_name, origin, e)
+                    _failed_imports[origin] = (snapshot, failure)
+                raise
+        return self._lazy_module
+
+    def _lazy_static_meta(self):
+        """Find ``__plugin__`` without importing, or ``DYNAMIC`` if only
+        importing can tell.
+        """
+
+        if self.loaded:
+            return DYNAMIC
+        if self._lazy_origin is None:
+            # Namespace packages have no code to define anything
+            return None
+        if self._lazy_origin.endswith(".py"):
+            return read_static_meta(self._lazy_origin)
+        return DYNAMIC
+
+    def _lazy_meta(self, collector=None):
+        """Find ``__plugin__``, from the source when it has literal values."""
+
+        meta = self._lazy_static_meta()
+        if meta is not DYNAMIC:
+            return meta
+        try:
+            return getattr(self._lazy_load(collector), "__plugin__", None)
+        except _IMPORT_ERRORS:
+            return None
+
+    def _lazy_failed(self, error):
+        failure = _import_failure(self._lazy_name, self._lazy_origin, error)
+        if self._lazy_errors is not None and failure not in self._lazy_errors:
+            self._lazy_errors.append(failure)
+
+    def __getattr__(self, attr):
+        if attr.startswith("_lazy_"):
+            raise AttributeError(attr)
+        try:
+            module = self._lazy_load()
+        except _IMPORT_ERRORS as e:
+            self._lazy_failed(e)
+            raise AttributeError(
+                "%r has no attribute %r, it failed to import" % (self, attr)
+            ) from e
+        return getattr(module, attr)
+
+    def __dir__(self):
+        return dir(self._lazy_load())
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return "<LazyModule %r (%s)>" % (self._lazy_name, state)
+
+
+class LoadCollector(object):
+    """Records where the time goes while plugins are loaded.
+
+    Give one to a loader as its ``collector`` to record the time spent listing
+    each location of a namespace, importing each plugin module (along with the
+    other modules each import brought in), and in each step of loading. Import
+    errors, which loaders otherwise ignore, are recorded as well. Subclasses
+    can override ``scanned()``, ``imported()``, ``failed()`` and ``timed()``
+    to act on each of these as it happens.
+
+    The modules brought in by each import are found by comparing
+    ``sys.modules`` before and after it, so loaders with ``workers`` import
+    their plugins one at a time while collecting.
+    """
+
+    def __init__(self):
+        self.scans = []
+        self.imports = []
+        self.failures = []
+        self.steps = {}
+        self._lock = threading.Lock()
+        # Reentrant, for plugins using lazy handles while they are imported
+        self._import_lock = threading.RLock()
+
+    def scanned(self, location, seconds):
+        with self._lock:
+            self.scans.append({"location": location, "seconds": seconds})
+
+    def imported(self, name, seconds, new_modules):
+        with self._lock:
+            self.imports.append(
+                {"module": name, "seconds": seconds, "new_modules": new_modules}
+            )
+
+    def failed(self, name, error):
+        with self._lock:
+            self.failures.append({"module": name, "error": repr(error)})
+
+    def timed(self, step, seconds):
+        with self._lock:
+            self.steps[step] = self.steps.get(step, 0.0) + seconds
+
+    def import_module(self, name):
+        # Other threads' imports would be credited to this one otherwise
+        with self._import_lock:
+            before = set(sys.modules)
+            start = time.perf_counter()
+            try:
+                module = import_module(name)
+            except _IMPORT_ERRORS as e:
+                self.failed(name, e)
+                raise
+            seconds = time.perf_counter() - start
+            new_modules = [m for m in list(sys.modules) if m not in before]
+        self.imported(name, seconds, new_modules)
+        return module
+
+    def report(self):
+        """Everything recorded so far, with the slowest imports first."""
+
+        with self._lock:
+            return {
+                "scans": list(self.scans),
+                "imports": sorted(self.imports, key=lambda i: -i["seconds"]),
+                "failures": list(self.failures),
+                "steps": dict(self.steps),
+            }
+
+
 class Loader(object):
     """Base loader class. Only used as a base-class for other loaders."""
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, collector=None, strict=False, **kwargs):
+        self.collector = collector
+        self.strict = strict
+        self.errors = []
         self._cache = []
         self.loaded = False
+        self._load_args = None
+        self._changed = False
+        self._reload_lock = threading.Lock()
+        self._namespaces = set()
+        self._preloaded = None
 
     def _fill_cache(self, *args, **kwargs):
         raise NotImplementedError()
 
-    def load(self, *args, **kwargs):
+    def load(self, namespace, *args, **kwargs):
         if not self.loaded:
-            self._fill_cache(*args, **kwargs)
-            self._post_fill()
-            self._order()
+            if self._load_args is None:
+                self._load_args = ((namespace,) + args, kwargs)
+            if self._preloaded is None:
+                self._preloaded = frozenset(sys.modules)
+            self._namespaces.add(namespace)
+            self.errors = []
+            if self.collector is None:
+                self._fill_cache(namespace, *args, **kwargs)
+                self._post_fill(namespace, *args, **kwargs)
+                self._order()
+                self._resolve()
+            else:
+                self._timed(self._fill_cache, namespace, *args, **kwargs)
+                self._timed(self._post_fill, namespace, *args, **kwargs)
+                self._timed(self._order)
+                self._timed(self._resolve)
+            if self.strict and self.errors:
+                raise PluginImportError(self.errors)
             self.loaded = True
-        return PluginManager(self._cache)
+        return PluginManager(self._cache, loader=self, errors=self.errors)
+
+    def _timed(self, step, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return step(*args, **kwargs)
+        finally:
+            name = "%s.%s" % (type(self).__name__, step.__name__.lstrip("_"))
+            self.collector.timed(name, time.perf_counter() - start)
+
+    def reload(self):
+        """Load the plugins again, picking up any which were changed, added
+        or removed since they were loaded. Only the changed modules are
+        imported again.
+
+        Returns whether anything changed. Managers already returned by
+        ``load()`` are not changed, use ``PluginManager.reload()`` for that.
+        """
+
+        if self._load_args is None:
+            return False
+        with self._reload_lock:
+            previous = self._cache
+            self._changed = self._refresh()
+            args, kwargs = self._load_args
+            self.loaded = False
+            try:
+                self.load(*args, **kwargs)
+            finally:
+                if not self.loaded:
+                    # Keep the plugins loaded before, as strict loads raise
+                    self._cache = previous
+                    self.loaded = True
+            changed = self._changed or len(previous) != len(self._cache)
+            changed = changed or any(a is not b for a, b in zip(previous, self._cache))
+        if changed:
+            unified_load.cache.invalidate(args[0])
+        return changed
+
+    def _refresh(self):
+        """Prepare to load again, returning whether anything already
+        loaded has changed.
+        """
+
+        return False
+
+    def unload(self):
+        """Forget the plugins, and remove the modules imported for them from
+        ``sys.modules``. Those are the modules in the namespaces loaded, and
+        the namespace packages themselves, which were not imported before
+        the first load. Other modules the plugins imported are left alone.
+
+        Returns a report of the ``modules`` removed, the number of objects
+        the garbage collector found unreachable as ``collected``, and the
+        ``memory`` freed in bytes if ``tracemalloc`` is tracing, else
+        ``None``. Plugins still referenced elsewhere are not freed.
+        """
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            before = tracemalloc.get_traced_memory()[0]
+
+        prefixes = self._unloadPrefixes()
+        removed = []
+        for name in list(sys.modules):
+            if self._preloaded is None or name in self._preloaded:
+                continue
+            parts = name.split(".")
+            for i in range(len(parts), 0, -1):
+                if ".".join(parts[:i]) in prefixes:
+                    break
+            else:
+                continue
+            _remove_module(name)
+            removed.append(name)
+        invalidate_caches()
+
+        for namespace in self._namespaces:
+            unified_load.cache.invalidate(namespace)
+        self._forget()
+        collected = gc.collect()
+
+        memory = None
+        if tracing:
+            memory = before - tracemalloc.get_traced_memory()[0]
+        return {"modules": sorted(removed), "collected": collected, "memory": memory}
+
+    def _unloadPrefixes(self):
+        """The names of the modules to unload, along with their sub-modules."""
+
+        return set(self._namespaces)
+
+    def _forget(self):
+        self._cache = []
+        self.loaded = False
+        self._load_args = None
+        self._namespaces = set()
+        self._preloaded = None
 
     def _meta(self, plugin):
+        if isinstance(plugin, LazyModule):
+            return plugin._lazy_meta(self.collector)
         meta = getattr(plugin, "__plugin__", None)
         return meta
 
-    def _post_fill(self):
-        for plugin in self._cache:
-            meta = self._meta(plugin)
-            if not getattr(meta, "load", True):
-                self._cache.remove(plugin)
-            for implied_namespace in getattr(meta, "imply_plugins", []):
-                plugins = self._cache
-                self._cache = self.load(implied_namespace)
-                self._post_fill()
-                combined = []
-                combined.extend(plugins)
-                combined.extend(self._cache)
-                self._cache = combined
+    def _post_fill(self, namespace, *args, **kwargs):
+        """Drop the plugins which are not to be loaded and add the plugins
+        of the namespaces they imply, which are found with the same
+        arguments as the namespace being loaded.
+
+        Each namespace is filled once, however many plugins imply it, so
+        namespaces implying each other are fine. Each plugin is kept once,
+        however many namespaces it was found through.
+        """
+
+        filled = set([namespace])
+        seen = set()
+        plugins = []
+
+        def accept(found):
+            implied = []
+            self._prepare_meta(found)
+            for plugin in found:
+                meta = self._meta(plugin)
+                implied.extend(getattr(meta, "imply_plugins", ()))
+                if id(plugin) in seen or not getattr(meta, "load", True):
+                    continue
+                seen.add(id(plugin))
+                plugins.append(plugin)
+            return iter(implied)
+
+        # Depth first, so a namespace's plugins are followed by those of the
+        # namespaces it implies, as the recursive version used to do
+        pending = [accept(self._cache)]
+        while pending:
+            implied_namespace = next(pending[-1], None)
+            if implied_namespace is None:
+                pending.pop()
+            elif implied_namespace not in filled:
+                filled.add(implied_namespace)
+                self._fill_cache(implied_namespace, *args, **kwargs)
+                pending.append(accept(self._cache))
+
+        self._namespaces.update(filled)
+        self._cache = plugins
+
+    def _prepare_meta(self, plugins):
+        """Called with each set of plugins found, before their
+        ``__plugin__`` settings are read.
+        """
 
     def _order(self):
         self._cache.sort(key=self._plugin_priority, reverse=True)
@@ -59,51 +792,483 @@ class Loader(object):
         meta = self._meta(plugin)
         return getattr(meta, "priority", 0.0)
 
+    def _resolve(self):
+        pass
+
+
+class DiscoveryIndex(object):
+    """A persistent record of plugin directory listings.
+
+    Each listed directory is stored with its modification time, along with
+    the modification times of its sub-directories, so a later process can
+    trust the recorded listing after a single ``stat`` per directory. Stale
+    entries are rescanned, and an unreadable or corrupt index file is treated
+    as empty. Failing to write the index is never an error.
+    """
+
+    VERSION = 2
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._dirty = False
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") != self.VERSION:
+                return {}
+            return {
+                "entries": dict(data["entries"]),
+                "entry_points": dict(data.get("entry_points") or {}),
+            }
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return {}
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self._read()
+            self._data.setdefault("entries", {})
+            self._data.setdefault("entry_points", {})
+        return self._data
+
+    @property
+    def entries(self):
+        return self.data["entries"]
+
+    def entry_points(self, fingerprint):
+        """Return the recorded entry point groups, if they were recorded
+        with the same ``fingerprint`` of the installed distributions.
+        """
+
+        recorded = self.data["entry_points"]
+        if recorded.get("fingerprint") != [list(item) for item in fingerprint]:
+            return None
+        try:
+            return dict(
+                (group, [tuple(item) for item in items])
+                for group, items in recorded["groups"].items()
+            )
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return None
+
+    def set_entry_points(self, fingerprint, groups):
+        self.data["entry_points"] = {
+            "fingerprint": [list(item) for item in fingerprint],
+            "groups": dict(
+                (group, [list(item) for item in items])
+                for group, items in groups.items()
+            ),
+        }
+        self._dirty = True
+
+    def _valid(self, directory, st, entry):
+        try:
+            if entry["mtime"] != st.st_mtime_ns:
+                return False
+            for name, mtime in entry["dirs"].items():
+                if os.stat(os.path.join(directory, name)).st_mtime_ns != mtime:
+                    return False
+        except (OSError, TypeError, KeyError, AttributeError):
+            return False
+        return True
+
+    def listing(self, directory, scan):
+        """Return the listing of a directory as ``(name, kind)`` pairs.
+
+        ``scan`` is called to produce a fresh listing when the directory has
+        no valid entry. Raises ``OSError`` if the directory cannot be read.
+        """
+
+        directory = os.path.abspath(directory)
+        st = os.stat(directory)
+        if not stat.S_ISDIR(st.st_mode):
+            raise NotADirectoryError(directory)
+
+        entry = self.entries.get(directory)
+        if entry is not None and self._valid(directory, st, entry):
+            return [tuple(item) for item in entry["listing"]]
+
+        listing = scan(directory)
+        dirs = {}
+        for name, kind in listing:
+            if kind == MODULE:
+                continue
+            try:
+                dirs[name] = os.stat(os.path.join(directory, name)).st_mtime_ns
+            except OSError:
+                continue
+        self.entries[directory] = {
+            "mtime": st.st_mtime_ns,
+            "dirs": dirs,
+            "listing": [list(item) for item in listing],
+        }
+        self._dirty = True
+        return listing
+
+    def save(self):
+        """Write the index back to disk, if anything changed."""
+
+        if not self._dirty:
+            return
+        data = dict(self.data, version=self.VERSION)
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".straight-index-")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            return
+        self._dirty = False
+
+
+class DiscoveryContext(object):
+    """Discovery results shared by all the loaders it is given to, so that
+    loading many namespaces lists each directory once.
+
+    The locations of each namespace, the listing of each directory and the
+    handle of each plugin module are remembered until ``clear()``, which
+    reloading any of the loaders does. A context is meant for loading a set
+    of namespaces together, such as at startup, and does not notice
+    ``sys.path`` or the directories changing in the meantime.
+    """
+
+    def __init__(self):
+        self._locations = {}
+        self._listings = {}
+        self._handles = {}
+        self._snapshots = {}
+
+    def locations(self, namespace, search):
+        try:
+            return self._locations[namespace]
+        except KeyError:
+            locations = self._locations[namespace] = search(namespace)
+            return locations
+
+    def listing(self, path, scan):
+        try:
+            return self._listings[path]
+        except KeyError:
+            listing = self._listings[path] = scan(path)
+            return listing
+
+    def directories(self):
+        """The paths listed since the context was last cleared."""
+
+        return list(self._listings)
+
+    def handle(self, import_path):
+        """The handle found for a module, or ``None``."""
+
+        return self._handles.get(import_path)
+
+    def snapshot(self, import_path):
+        """The state of a module's file when it was last imported, or found."""
+
+        return self._snapshots.get(import_path)
+
+    def add_handle(self, import_path, handle, snapshot):
+        self._handles[import_path] = handle
+        self._snapshots[import_path] = snapshot
+
+    def set_snapshot(self, import_path, snapshot):
+        if import_path in self._handles:
+            self._snapshots[import_path] = snapshot
+
+    def forget(self, import_path):
+        """Forget the handle of a module, which was removed or unloaded."""
+
+        self._handles.pop(import_path, None)
+        self._snapshots.pop(import_path, None)
+
+    def clear(self):
+        """Forget the namespace locations and directory listings.
+
+        Module handles are kept, and checked against their files as usual.
+        """
+
+        self._locations.clear()
+        self._listings.clear()
+
 
 class ModuleLoader(Loader):
     """Performs the work of locating and loading straight plugins.
 
-    This looks for plugins in every location in the import path.
+    This looks for plugins in every location of the namespace package, which
+    may be spread over many entries of the import path.
+
+    If ``index`` is given, it is the path of a file used to remember
+    directory listings between processes. See ``DiscoveryIndex``.
+
+    If ``lazy`` is true, plugins are returned as ``LazyModule`` handles and
+    each module is only imported when one of its attributes is first used.
+
+    Plugins are filtered and ordered before they are imported, whenever their
+    ``__plugin__`` settings can be read from the source (see
+    ``read_static_meta``), so plugins with ``load = False`` are never imported.
+
+    If ``workers`` is more than one, plugin modules are imported concurrently
+    by that many threads. The result is the same as importing them one by one.
+
+    If ``entry_points`` is true, the entry points registered by installed
+    distributions in the group named after the namespace are loaded too, and
+    ordered along with the plugins found in the namespace.
+
+    A ``LoadCollector`` given as ``collector`` records how long each part of
+    loading takes.
+
+    Loaders given the same ``DiscoveryContext`` as ``context`` share what
+    they discover, and list each directory once between them.
+
+    A namespace found in a ``FrozenRegistry`` given as ``registry`` is loaded
+    from the list of modules it holds, without any discovery, as long as the
+    registry is still valid.
+
+    Plugins which fail to import are left out, and listed in the ``errors``
+    of the ``PluginManager`` returned. They are not imported again until
+    their files change. If ``strict`` is true, ``load()`` raises
+    ``PluginImportError`` instead.
+
+    ``include`` and ``exclude`` are module names or ``fnmatch`` patterns,
+    matched against the dotted path of each plugin module and its name
+    relative to the namespace. Only the modules matching one of ``include``,
+    if given, and none of ``exclude`` are imported. The registry is not used
+    with either of them, as it does not know which namespace implied each
+    of its modules.
     """
 
-    def __init__(self, recurse=False):
-        super(ModuleLoader, self).__init__()
+    def __init__(
+        self,
+        recurse=False,
+        index=None,
+        lazy=False,
+        workers=None,
+        entry_points=False,
+        collector=None,
+        context=None,
+        registry=None,
+        strict=False,
+        include=None,
+        exclude=None,
+    ):
+        super(ModuleLoader, self).__init__(collector=collector, strict=strict)
+        self.context = context
+        self.include = _patterns(include)
+        self.exclude = _patterns(exclude)
+        self.registry = registry
+        self._frozen = False
         self.recurse = recurse
+        self.lazy = lazy
+        self.workers = workers
+        self.entry_points = entry_points
+        self._handles = {}
+        self._snapshots = {}
+        # This loader's own handles on shared lazy modules, by name
+        self._bound = {}
+        if isinstance(index, str):
+            index = DiscoveryIndex(index)
+        self.index = index
 
     def _isPackage(self, path):
         pkg_init = os.path.join(path, "__init__.py")
         return os.path.exists(pkg_init)
 
-    def _findPluginFilePaths(self, namespace):
-        already_seen = set()
+    def _scanDirectory(self, path):
+        """List the possible plugins in a directory as ``(name, kind)`` pairs.
 
-        # Look in each location in the path
-        for path in set(sys.path):
+        Only sub-directories need checking for an ``__init__.py``, everything
+        else is decided from the cached type of each directory entry.
+        """
 
-            # Within this, we want to look for a package for the namespace
-            namespace_rel_path = namespace.replace(".", os.path.sep)
-            namespace_path = os.path.join(path, namespace_rel_path)
-            try:
-                for possible in os.listdir(namespace_path):
+        listing = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir:
+                    if not _package_name(name):
+                        continue
+                    if self._isPackage(entry.path):
+                        listing.append((name, PACKAGE))
+                    else:
+                        listing.append((name, DIRECTORY))
+                elif name.endswith(".py") and name != "__init__.py":
+                    listing.append((name, MODULE))
+        return listing
 
-                    poss_path = os.path.join(namespace_path, possible)
+    def _listDirectory(self, path):
+        if self.context is not None:
+            return self.context.listing(path, self._listPath)
+        return self._listPath(path)
 
-                    if self._isPackage(poss_path):
-                        if self.recurse:
-                            subns = ".".join((namespace, possible.split(".py")[0]))
-                            for path in self._findPluginFilePaths(subns):
-                                yield path
-                        base = possible
-                    else:
-                        base, ext = os.path.splitext(possible)
-                        if base == "__init__" or ext != ".py":
-                            continue
+    def _listPath(self, path):
+        try:
+            if self.index is not None:
+                return self.index.listing(path, self._scanDirectory)
+            return self._scanDirectory(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return zip_listing(path)
+
+    def _listResources(self, namespace):
+        """List a namespace through its importer, for packages which are
+        neither on the filesystem nor in a zip archive.
+        """
+
+        if resource_files is None:
+            return []
+        try:
+            entries = list(resource_files(namespace).iterdir())
+        except Exception:
+            return []
+        listing = []
+        for entry in entries:
+            if entry.is_dir():
+                if not _package_name(entry.name):
+                    continue
+                if entry.joinpath("__init__.py").is_file():
+                    listing.append((entry.name, PACKAGE))
+                else:
+                    listing.append((entry.name, DIRECTORY))
+            elif entry.name.endswith(".py") and entry.name != "__init__.py":
+                listing.append((entry.name, MODULE))
+        return listing
+
+    def _searchLocations(self, namespace):
+        """Find the directories making up a namespace package, in the order
+        they are searched when importing from it.
+        """
+
+        module = sys.modules.get(namespace)
+        if module is None:
+            try:
+                spec = find_spec(namespace)
+            except (ImportError, ValueError):
+                return []
+            if spec is None or spec.submodule_search_locations is None:
+                return []
+            if not spec.has_location or not _may_extend_path(spec.origin):
+                return unique_list(spec.submodule_search_locations)
+            # The package adds to its own __path__, as with pkgutil.extend_path
+            try:
+                module = import_module(namespace)
+            except ImportError:
+                return []
+        return unique_list(getattr(module, "__path__", None) or [])
 
-                    if base not in already_seen:
-                        already_seen.add(base)
-                        yield os.path.join(namespace, possible)
+    def _listNamespace(self, namespace):
+        if self.context is not None:
+            locations = self.context.locations(namespace, self._searchLocations)
+        else:
+            locations = self._searchLocations(namespace)
+        listings = []
+        for namespace_path in locations:
+            start = time.perf_counter() if self.collector is not None else None
+            try:
+                listings.append(self._listDirectory(namespace_path))
             except (FileNotFoundError, NotADirectoryError):
                 pass
+            if start is not None:
+                seconds = time.perf_counter() - start
+                self.collector.scanned(namespace_path, seconds)
+        if not listings and namespace in sys.modules:
+            listings.append(self._listResources(namespace))
+        return listings
+
+    def _findPluginFilePaths(self, namespace):
+        already_seen = set()
+
+        # Look in each location the namespace package is found in
+        for listing in self._listNamespace(namespace):
+            for possible, kind in listing:
+
+                if kind == PACKAGE:
+                    if self.recurse:
+                        subns = ".".join((namespace, possible.split(".py")[0]))
+                        for path in self._findPluginFilePaths(subns):
+                            yield path
+                    base = possible
+                elif kind == MODULE:
+                    base = possible[:-3]
+                else:
+                    continue
+
+                if base not in already_seen:
+                    already_seen.add(base)
+                    yield os.path.join(namespace, possible)
+
+    def _moduleHandle(self, import_path):
+        """Find the handle for a plugin module, reusing the one from an
+        earlier load unless the module's file has changed since.
+        """
+
+        handle = self._handles.get(import_path)
+        if handle is not None:
+            snapshot = _snapshot(handle._lazy_origin)
+            if snapshot == self._snapshots.get(import_path):
+                return handle
+            self._changed = True
+            if self.context is not None:
+                # Another loader sharing the handle may have reloaded it
+                if self.context.snapshot(import_path) == snapshot:
+                    self._snapshots[import_path] = snapshot
+                    return handle
+            if handle.loaded and not self._reloadHandle(handle, snapshot):
+                return handle
+            self._snapshots[import_path] = snapshot
+            if self.context is not None:
+                self.context.set_snapshot(import_path, snapshot)
+            return handle
+
+        if self.context is not None:
+            handle = self.context.handle(import_path)
+            if handle is not None:
+                self._handles[import_path] = handle
+                self._snapshots[import_path] = self.context.snapshot(import_path)
+                return self._moduleHandle(import_path)
+
+        try:
+            spec = find_spec(import_path)
+        except (ImportError, ValueError):
+            spec = None
+        if spec is None:
+            return None
+
+        handle = LazyModule(import_path, spec.origin)
+        snapshot = self._snapshots[import_path] = _snapshot(spec.origin)
+        self._handles[import_path] = handle
+        if self.context is not None:
+            self.context.add_handle(import_path, handle, snapshot)
+        return handle
+
+    def _reloadHandle(self, handle, snapshot):
+        """Import a changed plugin module again, returning whether it worked.
+
+        A module which fails is dropped, to be imported afresh once it is
+        fixed, and its failure is recorded like that of a first import.
+        """
+
+        try:
+            reload_module(handle._lazy_module)
+            return True
+        except _IMPORT_ERRORS as e:
+            name, origin = handle._lazy_name, handle._lazy_origin
+            if sys.modules.get(name) is handle._lazy_module:
+                _remove_module(name)
+            handle._lazy_module = None
+            if snapshot is not None:
+                _failed_imports[origin] = (snapshot, _import_failure(name, origin, e))
+            return False
 
     def _findPluginModules(self, namespace):
         for filepath in self._findPluginFilePaths(namespace):
@@ -111,75 +1276,644 @@ class ModuleLoader(Loader):
             path_segments = [p for p in path_segments if p]
             path_segments[-1] = os.path.splitext(path_segments[-1])[0]
             import_path = ".".join(path_segments)
+            if not self._selected(import_path, namespace):
+                continue
 
-            try:
-                module = import_module(import_path)
-            except ImportError:
-                # raise Exception(import_path)
+            handle = self._pluginHandle(import_path)
+            if handle is not None:
+                yield handle
+
+    def _selected(self, import_path, namespace):
+        """Whether a module passes the ``include`` and ``exclude`` filters."""
 
-                module = None
+        if self.include is None and not self.exclude:
+            return True
+        names = [import_path]
+        if import_path.startswith(namespace + "."):
+            names.append(import_path[len(namespace) + 1 :])
 
-            if module is not None:
-                yield module
+        def matches(patterns):
+            return any(fnmatchcase(n, p) for n in names for p in patterns)
+
+        if self.include is not None and not matches(self.include):
+            return False
+        return not (self.exclude and matches(self.exclude))
+
+    def _pluginHandle(self, import_path):
+        """Find the handle for a plugin module, unless the module failed to
+        import and has not changed since.
+        """
+
+        handle = self._moduleHandle(import_path)
+        if handle is not None and handle._lazy_origin in _failed_imports:
+            failure = _failed_import(handle._lazy_origin)
+            if failure is not None:
+                self.errors.append(failure)
+                if self.collector is not None:
+                    self.collector.failed(import_path, failure.error)
+                return None
+        return handle
+
+    def _findEntryPoints(self, group):
+        for name, value in entry_point_index(self.index).get(group, ()):
+            module_name, _, attrs = value.partition(":")
+            module_name = module_name.strip()
+            if not self._selected(module_name, group):
+                continue
+            if not attrs:
+                handle = self._pluginHandle(module_name)
+                if handle is not None:
+                    yield handle
+                continue
+
+            try:
+                if self.collector is None:
+                    plugin = import_module(module_name)
+                else:
+                    plugin = self.collector.import_module(module_name)
+                for attr in attrs.strip().split("."):
+                    plugin = getattr(plugin, attr)
+            except (ImportError, AttributeError) as e:
+                self.errors.append(_import_failure(value, None, e))
+                continue
+            yield plugin
 
     def _fill_cache(self, namespace):
         """Load all modules found in a namespace"""
 
-        modules = self._findPluginModules(namespace)
+        frozen = None
+        filtered = self.include is not None or self.exclude
+        if self.registry is not None and not (self.entry_points or filtered):
+            frozen = self.registry.lookup(namespace, self.recurse)
+        if frozen is not None:
+            # Already filtered and ordered when the registry was made
+            self._frozen = True
+            handles = map(self._pluginHandle, frozen)
+            self._cache = [h for h in handles if h is not None]
+            return
+
+        modules = list(self._findPluginModules(namespace))
+
+        if self.entry_points:
+            found = set(m._lazy_name for m in modules)
+            for plugin in self._findEntryPoints(namespace):
+                if isinstance(plugin, LazyModule):
+                    if plugin._lazy_name in found:
+                        continue
+                    found.add(plugin._lazy_name)
+                modules.append(plugin)
+
+        self._cache = modules
+        if self.index is not None:
+            self.index.save()
 
-        self._cache = list(modules)
+    def _post_fill(self, namespace, *args, **kwargs):
+        if not self._frozen:
+            super(ModuleLoader, self)._post_fill(namespace, *args, **kwargs)
+            # Implied namespaces found in the registry are ordered as usual
+            self._frozen = False
+
+    def _prepare_meta(self, plugins):
+        if not (self.workers and self.workers > 1):
+            return
+        # Their settings are only known once they are imported, so import
+        # them together rather than one at a time as they are read
+        dynamic = [
+            p
+            for p in plugins
+            if isinstance(p, LazyModule)
+            and not p.loaded
+            and p._lazy_static_meta() is DYNAMIC
+        ]
+        if len(dynamic) > 1:
+            with ThreadPoolExecutor(self.workers) as executor:
+                list(executor.map(self._resolvePlugin, dynamic))
+
+    def _order(self):
+        if self._frozen:
+            self._frozen = False
+        else:
+            super(ModuleLoader, self)._order()
+
+    def _unloadPrefixes(self):
+        prefixes = super(ModuleLoader, self)._unloadPrefixes()
+        # Entry points may name modules outside of the namespace
+        prefixes.update(self._handles)
+        return prefixes
+
+    def _forget(self):
+        super(ModuleLoader, self)._forget()
+        for import_path, handle in self._handles.items():
+            handle._lazy_module = None
+            _failed_imports.pop(handle._lazy_origin, None)
+            if self.context is not None:
+                self.context.forget(import_path)
+        self._handles = {}
+        self._snapshots = {}
+        self._bound = {}
+
+    def _refresh(self):
+        invalidate_caches()
+        if self.context is not None:
+            self.context.clear()
+        changed = False
+        for import_path, handle in list(self._handles.items()):
+            if self._snapshots.get(import_path) is None:
+                continue
+            if _snapshot(handle._lazy_origin) is None:
+                del self._handles[import_path]
+                del self._snapshots[import_path]
+                self._bound.pop(import_path, None)
+                if self.context is not None:
+                    self.context.forget(import_path)
+                sys.modules.pop(import_path, None)
+                changed = True
+        return changed
+
+    def _resolvePlugin(self, plugin):
+        if isinstance(plugin, LazyModule):
+            try:
+                return plugin._lazy_load(self.collector)
+            except _IMPORT_ERRORS as e:
+                return _import_failure(plugin._lazy_name, plugin._lazy_origin, e)
+        return plugin
+
+    def _boundHandle(self, plugin):
+        if not isinstance(plugin, LazyModule):
+            return plugin
+        bound = self._bound.get(plugin._lazy_name)
+        if bound is None or bound._lazy_handle is not plugin:
+            bound = plugin._lazy_bind(self.collector, self.errors)
+            self._bound[plugin._lazy_name] = bound
+        # Imports failing later are reported to the manager returned
+        bound._lazy_errors = self.errors
+        return bound
+
+    def _resolve(self):
+        if self.lazy:
+            # Handles may be shared with other loaders, so this loader's
+            # imports are made through handles of its own
+            self._cache = [self._boundHandle(plugin) for plugin in self._cache]
+            return
+        if self.workers and self.workers > 1 and len(self._cache) > 1:
+            with ThreadPoolExecutor(self.workers) as executor:
+                modules = list(executor.map(self._resolvePlugin, self._cache))
+        else:
+            modules = [self._resolvePlugin(plugin) for plugin in self._cache]
+        self._cache = []
+        for module in modules:
+            if isinstance(module, ImportFailure):
+                self.errors.append(module)
+            else:
+                self._cache.append(module)
 
 
 class ObjectLoader(Loader):
     """Loads classes or objects out of modules in a namespace, based on a
     provided criteria.
 
-    The load() method returns all objects exported by the module.
+    The load() method returns all objects exported by the module: the names
+    in its ``__all__``, or else its names not starting with an underscore.
+    With ``local_only``, only the objects which were defined in the module,
+    such as its classes and functions, are returned and anything imported
+    into it is skipped.
+
+    Modules are found as by ``ModuleLoader``, given the same options.
     """
 
-    def __init__(self, recurse=False):
-        super().__init__()
-        self.module_loader = ModuleLoader(recurse=recurse)
+    def __init__(
+        self,
+        recurse=False,
+        index=None,
+        workers=None,
+        entry_points=False,
+        collector=None,
+        local_only=False,
+        context=None,
+        registry=None,
+        strict=False,
+        include=None,
+        exclude=None,
+    ):
+        super().__init__(collector=collector, strict=strict)
+        self.local_only = local_only
+        self._module_options = dict(
+            recurse=recurse,
+            index=index,
+            workers=workers,
+            entry_points=entry_points,
+            collector=collector,
+            context=context,
+            registry=registry,
+            include=include,
+            exclude=exclude,
+        )
+        self.module_loader = ModuleLoader(**self._module_options)
+
+    def reload(self):
+        if not self.module_loader.reload():
+            return False
+        return super(ObjectLoader, self).reload()
+
+    def _refresh(self):
+        # Only reached once the modules have changed
+        return True
+
+    def _unloadPrefixes(self):
+        prefixes = super(ObjectLoader, self)._unloadPrefixes()
+        prefixes.update(self.module_loader._unloadPrefixes())
+        return prefixes
+
+    def _forget(self):
+        super(ObjectLoader, self)._forget()
+        self.module_loader._forget()
+
+    def _modules(self, namespace):
+        if self._load_args[0][0] == namespace:
+            return self.module_loader.load(namespace)
+        # A namespace implied by one of the objects
+        return ModuleLoader(**self._module_options).load(namespace)
+
+    def _exported(self, module):
+        """The exported names of a module, in the order ``dir()`` gives."""
+
+        names = getattr(module, "__all__", None)
+        if names is None:
+            names = [name for name in vars(module) if not name.startswith("_")]
+        return sorted(names)
+
+    def _objects(self, module):
+        namespace = vars(module)
+        for name in self._exported(module):
+            try:
+                obj = namespace[name]
+            except KeyError:
+                # Provided by a module __getattr__, or missing from __all__
+                try:
+                    obj = getattr(module, name)
+                except AttributeError:
+                    continue
+            if self.local_only and getattr(obj, "__module__", None) != module.__name__:
+                continue
+            yield obj
 
     def _fill_cache(self, namespace):
-        modules = self.module_loader.load(namespace)
         objects = []
 
+        modules = self._modules(namespace)
+        self.errors.extend(modules.errors)
         for module in modules:
-            for attr_name in dir(module):
-                if not attr_name.startswith("_"):
-                    objects.append(getattr(module, attr_name))
+            if not isinstance(module, ModuleType):
+                # An entry point naming an object rather than a module
+                objects.append(module)
+                continue
+            objects.extend(self._objects(module))
 
         self._cache = objects
         return objects
 
 
+def _subclass_tree(bases):
+    """All the subclasses of some classes, by the module defining them."""
+
+    found = {}
+    seen = set()
+    pending = list(bases)
+    while pending:
+        for cls in type.__subclasses__(pending.pop()):
+            if cls not in seen:
+                seen.add(cls)
+                found.setdefault(cls.__module__, []).append(cls)
+                pending.append(cls)
+    return found
+
+
 class ClassLoader(ObjectLoader):
     """Loads classes out of plugin modules which are subclasses of a single
     given base class.
+
+    With ``local_only`` and a base class, the classes are found by walking
+    the base class's ``__subclasses__()`` rather than looking through each
+    module, so only classes defined in a plugin module under their own
+    name are found.
     """
 
     def _fill_cache(self, namespace, subclasses=None):
-        objects = super(ClassLoader, self)._fill_cache(namespace)
-        classes = []
-        for cls in objects:
-            if isinstance(cls, type):
-                if subclasses is None:
-                    classes.append(cls)
-                elif issubclass(cls, subclasses) and cls is not subclasses:
-                    classes.append(cls)
+        if self.local_only and subclasses is not None:
+            classes = self._fill_subclasses(namespace, subclasses)
+        else:
+            classes = []
+            for cls in super(ClassLoader, self)._fill_cache(namespace):
+                if isinstance(cls, type):
+                    if subclasses is None:
+                        classes.append(cls)
+                    elif issubclass(cls, subclasses) and cls is not subclasses:
+                        classes.append(cls)
 
         self._cache = classes
         return classes
 
+    def _fill_subclasses(self, namespace, subclasses):
+        bases = subclasses if isinstance(subclasses, tuple) else (subclasses,)
+        modules = self._modules(namespace)
+        self.errors.extend(modules.errors)
+        # Walked once the modules are imported and their classes defined
+        tree = _subclass_tree(bases)
+        classes = []
+
+        for module in modules:
+            if not isinstance(module, ModuleType):
+                if isinstance(module, type) and issubclass(module, subclasses):
+                    if module is not subclasses:
+                        classes.append(module)
+                continue
+            defined = tree.get(module.__name__)
+            if not defined:
+                continue
+            exported = set(self._exported(module))
+            found = [
+                cls
+                for cls in defined
+                if cls.__name__ in exported and vars(module).get(cls.__name__) is cls
+            ]
+            found.sort(key=lambda cls: cls.__name__)
+            classes.extend(found)
+
+        return classes
+
+
+# In the order of functools.lru_cache's, which unified_load used to be
+CacheInfo = namedtuple("CacheInfo", "hits misses maxsize currsize rebuilds")
+
+
+class LoadCache(object):
+    """Keeps the plugins loaded by ``unified_load``.
+
+    At most ``maxsize`` results are kept, the least recently used being
+    discarded first, or any number if ``maxsize`` is ``None``. Each result is
+    kept with a fingerprint of ``sys.path`` and of the namespace's locations,
+    and is loaded again (a rebuild) when it is asked for after either changed.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = self.misses = self.rebuilds = 0
+
+    def get(self, key, fingerprint):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != fingerprint:
+                self.rebuilds += 1
+                del self._entries[key]
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, fingerprint, plugins):
+        with self._lock:
+            self._entries[key] = (fingerprint, plugins)
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+    def invalidate(self, namespace=None):
+        """Forget the plugins loaded from a namespace, or everything."""
+
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if key[0] == namespace:
+                    del self._entries[key]
+
+    def clear(self):
+        """Forget everything, and reset the statistics."""
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.rebuilds = 0
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(
+                self.hits, self.misses, self.maxsize, len(self._entries), self.rebuilds
+            )
+
+    @staticmethod
+    def fingerprint(namespace):
+        module = sys.modules.get(namespace)
+        roots = tuple(getattr(module, "__path__", None) or ())
+        return (tuple(sys.path), roots)
+
 
-@lru_cache(maxsize=None, typed=False)
-def unified_load(namespace, subclasses=None, recurse=False):
+class FrozenRegistry(object):
+    """The plugins of some namespaces, found, filtered and ordered ahead of
+    time by ``freeze()``.
+
+    ``plugins`` maps ``(namespace, recurse)`` to a dictionary of the plugin
+    ``modules``, in order, and the modification times of the directories
+    they were found in, as ``locations``. An entry is only used while none
+    of those directories have changed, so adding or removing a plugin makes
+    it fall back to discovery. Changes to an existing plugin's
+    ``__plugin__`` settings, or new locations of a namespace, are not
+    noticed until the registry is frozen again.
+    """
+
+    def __init__(self, plugins):
+        self.plugins = plugins
+
+    @classmethod
+    def from_module(cls, module):
+        if isinstance(module, str):
+            module = import_module(module)
+        return cls(module.PLUGINS)
+
+    def lookup(self, namespace, recurse=False):
+        """The names of the plugin modules of a namespace, or ``None`` if
+        the namespace is not in the registry or has changed.
+        """
+
+        try:
+            entry = self.plugins.get((namespace, recurse))
+            if entry is None:
+                return None
+            for path, mtime in entry["locations"].items():
+                if os.stat(path).st_mtime_ns != mtime:
+                    return None
+            return list(entry["modules"])
+        except (OSError, KeyError, TypeError, AttributeError):
+            # Changed, or not a registry written by freeze()
+            return None
+
+
+def freeze(namespaces, recurse=False, path=None):
+    """Find the plugins of some namespaces, with their ``load`` settings,
+    implied namespaces and priorities applied, and return the source of a
+    registry module listing them. It is also written to ``path``, if given.
+
+    ``unified_load`` uses the registry once it is registered with
+    ``load_registry()`` or named by the ``STRAIGHT_PLUGIN_REGISTRY``
+    environment variable.
+    """
+
+    if isinstance(namespaces, str):
+        namespaces = [namespaces]
+    plugins = {}
+    for namespace in namespaces:
+        context = DiscoveryContext()
+        loader = ModuleLoader(recurse=recurse, lazy=True, context=context)
+        modules = [
+            plugin._lazy_name
+            for plugin in loader.load(namespace)
+            if isinstance(plugin, LazyModule)
+        ]
+        locations = {}
+        for directory in sorted(context.directories()):
+            if os.path.isdir(directory):
+                locations[directory] = os.stat(directory).st_mtime_ns
+        plugins[(namespace, recurse)] = {"modules": modules, "locations": locations}
+
+    lines = [
+        '"""Plugins frozen by ``python -m straight.plugin freeze``."""',
+        "",
+        "PLUGINS = {",
+    ]
+    # JSON strings are Python strings too, and read like the rest of the file
+    for (namespace, recurse), entry in plugins.items():
+        lines.append("    (%s, %r): {" % (json.dumps(namespace), recurse))
+        lines.append('        "modules": [')
+        lines.extend("            %s," % json.dumps(name) for name in entry["modules"])
+        lines.append("        ],")
+        lines.append('        "locations": {')
+        for directory, mtime in entry["locations"].items():
+            lines.append("            %s: %d," % (json.dumps(directory), mtime))
+        lines.append("        },")
+        lines.append("    },")
+    lines.append("}")
+    source = "\n".join(lines) + "\n"
+    if path is not None:
+        with open(path, "w") as f:
+            f.write(source)
+    return source
+
+
+_registry = None
+_registry_checked = False
+
+
+def load_registry(registry):
+    """Make ``unified_load`` use a registry written by ``freeze()``, given as
+    a ``FrozenRegistry``, a module or the name of a module. ``None`` stops
+    using any registry.
+    """
+
+    global _registry, _registry_checked
+    if registry is not None and not isinstance(registry, FrozenRegistry):
+        registry = FrozenRegistry.from_module(registry)
+    _registry = registry
+    _registry_checked = True
+    unified_load.cache.invalidate()
+
+
+def _active_registry():
+    if not _registry_checked:
+        name = os.environ.get("STRAIGHT_PLUGIN_REGISTRY")
+        try:
+            load_registry(name or None)
+        except (ImportError, AttributeError, KeyError):
+            # Missing or broken, so plugins are discovered as usual
+            load_registry(None)
+    return _registry
+
+
+def unified_load(
+    namespace,
+    subclasses=None,
+    recurse=False,
+    lazy=False,
+    workers=None,
+    entry_points=False,
+    context=None,
+    strict=False,
+    include=None,
+    exclude=None,
+):
     """Provides a unified interface to both the module and class loaders,
     finding modules by default or classes if given a ``subclasses`` parameter.
+
+    Modules can be loaded as ``LazyModule`` handles with ``lazy=True``. This
+    has no effect when loading classes, which requires importing the modules.
+    Plugins are imported by a pool of threads if ``workers`` is given.
+    Plugins registered as entry points in a group named after the namespace
+    are included with ``entry_points=True``. Loading many namespaces with
+    the same ``DiscoveryContext`` as ``context`` lists each directory once.
+    Namespaces in the registry given to ``load_registry()`` are loaded
+    without any discovery, see ``freeze()``.
+    Plugins which fail to import are listed in the ``errors`` of the result,
+    or raise ``PluginImportError`` with ``strict=True``.
+    Only the plugin modules matching ``include`` and not ``exclude``, names
+    or ``fnmatch`` patterns, are imported.
+
+    Results are kept in ``unified_load.cache``, a ``LoadCache``.
     """
 
+    cache = unified_load.cache
+    include, exclude = _patterns(include), _patterns(exclude)
+    key = (
+        namespace,
+        subclasses,
+        recurse,
+        lazy,
+        workers,
+        entry_points,
+        strict,
+        include,
+        exclude,
+    )
+    plugins = cache.get(key, cache.fingerprint(namespace))
+    if plugins is not None:
+        return plugins
+
+    registry = _active_registry()
+
     if subclasses is not None:
-        return ClassLoader(recurse=recurse).load(namespace, subclasses=subclasses)
+        loader = ClassLoader(
+            recurse=recurse,
+            workers=workers,
+            entry_points=entry_points,
+            context=context,
+            registry=registry,
+            strict=strict,
+            include=include,
+            exclude=exclude,
+        )
+        plugins = loader.load(namespace, subclasses=subclasses)
     else:
-        return ModuleLoader(recurse=recurse).load(namespace)
+        loader = ModuleLoader(
+            recurse=recurse,
+            lazy=lazy,
+            workers=workers,
+            entry_points=entry_points,
+            context=context,
+            registry=registry,
+            strict=strict,
+            include=include,
+            exclude=exclude,
+        )
+        plugins = loader.load(namespace)
+
+    cache.put(key, cache.fingerprint(namespace), plugins)
+    return plugins
+
+
+unified_load.cache = LoadCache()
+unified_load.cache_info = unified_load.cache.info
+unified_load.cache_clear = unified_load.cache.clear
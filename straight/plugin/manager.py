@@ -1,6 +1,208 @@
+import asyncio
+import bisect
+import inspect
+import itertools
+import operator
+import threading
+import time
+from collections import namedtuple
+from concurrent import futures
+
+PluginResult = namedtuple("PluginResult", "plugin value error")
+
+
+class _Started(object):
+    """Calls a method, noting when the call starts."""
+
+    def __init__(self, method):
+        self.method = method
+        self.time = None
+        self.event = threading.Event()
+
+    def __call__(self, *args, **kwargs):
+        self.time = time.monotonic()
+        self.event.set()
+        return self.method(*args, **kwargs)
+
+
+async def _result(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+def _chunks(items, chunksize):
+    # Each chunk is the values to pass on and the last result of each item,
+    # the two things pipe() keeps track of for a single value.
+    items = iter(items)
+    while True:
+        values = list(itertools.islice(items, chunksize))
+        if not values:
+            return
+        yield values, list(values)
+
+
+def _item_stage(chunks, method, args, kwargs):
+    for values, results in chunks:
+        for i, value in enumerate(values):
+            r = method(value, *args, **kwargs)
+            results[i] = r
+            if r is not None:
+                values[i] = r
+        yield values, results
+
+
+def _batch_stage(chunks, method, args, kwargs):
+    for values, results in chunks:
+        batch = method(values, *args, **kwargs)
+        if len(batch) != len(values):
+            raise ValueError(
+                "%r returned %d results for %d items"
+                % (method, len(batch), len(values))
+            )
+        for i, r in enumerate(batch):
+            results[i] = r
+            if r is not None:
+                values[i] = r
+        yield values, results
+
+
+_COMPARISONS = {
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "lt": operator.lt,
+    "le": operator.le,
+    "contains": operator.contains,
+}
+
+_LOOKUPS = frozenset(_COMPARISONS) | frozenset(["exact", "ne", "in"])
+
+
+class _AttributeIndex(object):
+    """The values of one ``__plugin__`` setting, by the position of each
+    plugin which has it, for looking plugins up by the setting.
+    """
+
+    def __init__(self, values):
+        self.values = values
+        self.positions = frozenset(values)
+        self.exact = {}
+        self.unhashable = []
+        for position, value in values.items():
+            try:
+                self.exact.setdefault(value, set()).add(position)
+            except TypeError:
+                self.unhashable.append(position)
+        try:
+            self.ordered = sorted((v, p) for p, v in values.items())
+        except TypeError:
+            self.ordered = None
+        else:
+            self.keys = [v for v, _ in self.ordered]
+
+    def lookup(self, lookup, operand):
+        if lookup == "exact":
+            return self._exact(operand)
+        if lookup == "in":
+            return set().union(*(self._exact(o) for o in operand))
+        if lookup == "ne":
+            return self.positions - self._exact(operand)
+        if lookup in ("gt", "ge", "lt", "le") and self.ordered is not None:
+            try:
+                if lookup == "gt":
+                    matches = self.ordered[bisect.bisect_right(self.keys, operand) :]
+                elif lookup == "ge":
+                    matches = self.ordered[bisect.bisect_left(self.keys, operand) :]
+                elif lookup == "lt":
+                    matches = self.ordered[: bisect.bisect_left(self.keys, operand)]
+                else:
+                    matches = self.ordered[: bisect.bisect_right(self.keys, operand)]
+            except TypeError:
+                pass
+            else:
+                return set(p for _, p in matches)
+        return self._scan(_COMPARISONS[lookup], operand)
+
+    def _exact(self, operand):
+        try:
+            matches = set(self.exact.get(operand, ()))
+        except TypeError:
+            return self._scan(operator.eq, operand)
+        return matches | self._scan(operator.eq, operand, self.unhashable)
+
+    def _scan(self, compare, operand, positions=None):
+        matches = set()
+        for position in self.values if positions is None else positions:
+            try:
+                if compare(self.values[position], operand):
+                    matches.add(position)
+            except TypeError:
+                pass
+        return matches
+
+
+class Hook(object):
+    """A method common to a set of plugins, looked up on every plugin once
+    and then called as often as needed.
+
+    The methods are looked up again whenever the manager's set of plugins is
+    replaced, for example by ``PluginManager.reload()``.
+    """
+
+    def __init__(self, manager, methodname):
+        self.manager = manager
+        self.methodname = methodname
+        self._plugins = None
+        self._methods = ()
+
+    def methods(self):
+        plugins = self.manager._plugins
+        if plugins is not self._plugins:
+            methods = []
+            for plugin in plugins:
+                method = getattr(plugin, self.methodname, None)
+                if method is not None:
+                    methods.append(method)
+            self._methods = tuple(methods)
+            self._plugins = plugins
+        return self._methods
+
+    def __call__(self, *args, **kwargs):
+        """Call the method on all the plugins, returning a list of results."""
+
+        return [method(*args, **kwargs) for method in self.methods()]
+
+    def first(self, *args, **kwargs):
+        """Like ``PluginManager.first()``."""
+
+        for method in self.methods():
+            r = method(*args, **kwargs)
+            if r is not None:
+                return r
+
+        raise ValueError("No plugins returned a non-None value")
+
+    def pipe(self, first_arg, *args, **kwargs):
+        """Like ``PluginManager.pipe()``."""
+
+        r = first_arg
+        for method in self.methods():
+            r = method(first_arg, *args, **kwargs)
+            if r is not None:
+                first_arg = r
+        return r
+
+
 class PluginManager(object):
-    def __init__(self, plugins):
+    def __init__(self, plugins, loader=None, errors=None):
         self._plugins = plugins
+        self._loader = loader
+        # The loader's list, which lazy plugins add their import failures to
+        self.errors = [] if errors is None else errors
+        self._hooks = {}
+        self._indexed = None
+        self._methodindex = {}
+        self._attributeindex = {}
 
     def __iter__(self):
         return iter(self._plugins)
@@ -11,6 +213,35 @@ class PluginManager(object):
     def __getitem__(self, index):
         return self._plugins[index]
 
+    def reload(self):
+        """Reload the plugins from the loader which found them, picking up
+        any which were changed, added or removed. Returns whether anything
+        changed.
+
+        The new set of plugins replaces the old one all at once, so anything
+        already iterating over the plugins continues with the old set.
+        """
+
+        if self._loader is None:
+            raise ValueError("These plugins were not found by a loader")
+        changed = self._loader.reload()
+        args, kwargs = self._loader._load_args
+        loaded = self._loader.load(*args, **kwargs)
+        self._plugins = loaded._plugins
+        self.errors = loaded.errors
+        return changed
+
+    def unload(self):
+        """Forget the plugins, and unload the modules imported for them by
+        the loader which found them. Returns the loader's report, see
+        ``Loader.unload()``.
+        """
+
+        if self._loader is None:
+            raise ValueError("These plugins were not found by a loader")
+        self._plugins = []
+        return self._loader.unload()
+
     def produce(self, *args, **kwargs):
         """Produce a new set of plugins, treating the current set as plugin
         factories.
@@ -22,6 +253,86 @@ class PluginManager(object):
             new_plugins.append(r)
         return PluginManager(new_plugins)
 
+    def hook(self, methodname):
+        """Get a ``Hook`` for calling a common method on all the plugins
+        repeatedly, without looking the method up on each plugin every time.
+
+        The plugins are only searched for the method the first time it is
+        called, and again after the set of plugins is replaced. Changing the
+        list of plugins in place is not noticed.
+        """
+
+        hook = self._hooks.get(methodname)
+        if hook is None:
+            hook = self._hooks[methodname] = Hook(self, methodname)
+        return hook
+
+    def _indexes(self):
+        if self._indexed is not self._plugins:
+            self._indexed = self._plugins
+            self._methodindex = {}
+            self._attributeindex = {}
+        return self._methodindex, self._attributeindex
+
+    def _implementing(self, methodname):
+        methodindex = self._indexes()[0]
+        positions = methodindex.get(methodname)
+        if positions is None:
+            positions = methodindex[methodname] = frozenset(
+                position
+                for position, plugin in enumerate(self._plugins)
+                if getattr(plugin, methodname, None) is not None
+            )
+        return positions
+
+    def _attribute(self, name):
+        attributeindex = self._indexes()[1]
+        index = attributeindex.get(name)
+        if index is None:
+            missing = object()
+            values = {}
+            for position, plugin in enumerate(self._plugins):
+                meta = getattr(plugin, "__plugin__", None)
+                value = getattr(meta, name, missing)
+                if value is not missing:
+                    values[position] = value
+            index = attributeindex[name] = _AttributeIndex(values)
+        return index
+
+    def _selection(self, positions):
+        return PluginManager([self._plugins[p] for p in sorted(positions)])
+
+    def implementing(self, methodname):
+        """Get a new ``PluginManager`` of the plugins which have a method."""
+
+        return self._selection(self._implementing(methodname))
+
+    def select(self, **criteria):
+        """Get a new ``PluginManager`` of the plugins whose ``__plugin__``
+        settings match all of the criteria, keeping their order.
+
+        Each criterion is a setting name, optionally followed by a lookup:
+        ``priority__gt=1`` matches plugins with a priority greater than one.
+        The lookups are ``exact`` (the default), ``ne``, ``in``, ``gt``,
+        ``ge``, ``lt``, ``le`` and ``contains``. Plugins which do not have a
+        setting never match a criterion for it.
+
+        The plugins are indexed by each setting the first time it is used,
+        and again after the set of plugins is replaced. Changing the list of
+        plugins, or their settings, in place is not noticed.
+        """
+
+        positions = None
+        for key, operand in criteria.items():
+            name, _, lookup = key.rpartition("__")
+            if not name or lookup not in _LOOKUPS:
+                name, lookup = key, "exact"
+            matches = self._attribute(name).lookup(lookup, operand)
+            positions = matches if positions is None else positions & matches
+        if positions is None:
+            positions = range(len(self._plugins))
+        return self._selection(positions)
+
     def call(self, methodname, *args, **kwargs):
         """Call a common method on all the plugins, if it exists."""
 
@@ -42,6 +353,242 @@ class PluginManager(object):
 
         raise ValueError("No plugins returned a non-None value")
 
+    def _methods(self, methodname):
+        for plugin in self._plugins:
+            method = getattr(plugin, methodname, None)
+            if method is not None:
+                yield method
+
+    def _tasks(self, methods, args, kwargs, concurrency):
+        """Start calling the methods as tasks, no more than ``concurrency``
+        at once if it is a number.
+        """
+
+        if concurrency is True:
+            semaphore = None
+        else:
+            semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(method):
+            if semaphore is None:
+                return await _result(method(*args, **kwargs))
+            async with semaphore:
+                return await _result(method(*args, **kwargs))
+
+        return [asyncio.ensure_future(run(method)) for method in methods]
+
+    def fanout(
+        self,
+        methodname,
+        args=(),
+        kwargs=None,
+        executor=None,
+        ordered=True,
+        timeout=None,
+        collect_errors=False,
+    ):
+        """Call a common method on all the plugins at once, if it exists,
+        using a ``concurrent.futures`` executor. Returns an iterator of the
+        results, in the order of the plugins or, if ``ordered`` is false, in
+        the order they finish.
+
+        Without an ``executor``, a thread is started for each plugin. A
+        process pool can be used for methods which can be pickled.
+
+        Each plugin is given ``timeout`` seconds, counted from when its call
+        starts, before it fails with a ``TimeoutError``. A call which has not
+        started ``timeout`` seconds after it was submitted, waiting for a free
+        worker of the executor, fails the same way, so no call takes more
+        than twice ``timeout``. With executors other than thread pools, such
+        as process pools, the time is counted from when the calls were
+        submitted instead.
+
+        The first failure is raised and the calls not yet started are
+        cancelled, unless ``collect_errors`` is true. Then every result is
+        given as a ``PluginResult(plugin, value, error)``, with ``error`` set
+        to the exception of each plugin which failed.
+        """
+
+        kwargs = kwargs or {}
+        calls = []
+        for plugin in self._plugins:
+            method = getattr(plugin, methodname, None)
+            if method is not None:
+                calls.append((plugin, method))
+
+        own_executor = executor is None
+        if own_executor:
+            executor = futures.ThreadPoolExecutor(max(1, len(calls)))
+        # Calls run in this process note when they start, for their timeouts
+        timed = timeout is not None and isinstance(executor, futures.ThreadPoolExecutor)
+        submitted = {}
+        started = {}
+        for plugin, method in calls:
+            call = _Started(method) if timed else method
+            future = executor.submit(call, *args, **kwargs)
+            submitted[future] = plugin
+            if timed:
+                started[future] = call
+        submit_time = time.monotonic()
+
+        def expires(future):
+            """When the call times out: ``timeout`` after it started, or
+            after it was submitted while it has not started.
+            """
+
+            call = started.get(future)
+            if call is None or call.time is None:
+                return submit_time + timeout
+            return call.time + timeout
+
+        def remaining(future):
+            if timeout is None:
+                return None
+            call = started.get(future)
+            if call is not None:
+                call.event.wait(max(0.0, submit_time + timeout - time.monotonic()))
+            return max(0.0, expires(future) - time.monotonic())
+
+        def outcome(future, wait):
+            try:
+                value = future.result(timeout=wait)
+            except futures.TimeoutError:
+                future.cancel()
+                error = futures.TimeoutError(
+                    "%r did not finish in %s seconds" % (submitted[future], timeout)
+                )
+            except Exception as e:
+                error = e
+            else:
+                return PluginResult(submitted[future], value, None)
+            if not collect_errors:
+                raise error
+            return PluginResult(submitted[future], None, error)
+
+        def in_order():
+            for future in submitted:
+                yield outcome(future, remaining(future))
+
+        def next_wait(pending):
+            if timeout is None:
+                return None
+            # Calls starting meanwhile are given longer when this wakes up
+            return max(0.0, min(map(expires, pending)) - time.monotonic())
+
+        def as_completed():
+            pending = set(submitted)
+            while pending:
+                done, _ = futures.wait(
+                    pending,
+                    timeout=next_wait(pending),
+                    return_when=futures.FIRST_COMPLETED,
+                )
+                finished = list(done)
+                if timeout is not None:
+                    now = time.monotonic()
+                    for future in pending - done:
+                        if expires(future) <= now:
+                            finished.append(future)
+                for future in finished:
+                    pending.discard(future)
+                    yield outcome(future, 0)
+
+        def results():
+            try:
+                for result in in_order() if ordered else as_completed():
+                    yield result if collect_errors else result.value
+            finally:
+                for future in submitted:
+                    future.cancel()
+                if own_executor:
+                    executor.shutdown(wait=False)
+
+        return results()
+
+    async def acall(self, methodname, *args, concurrency=None, **kwargs):
+        """Call a common method on all the plugins, if it exists, awaiting
+        the result of each which is awaitable. This is an asynchronous
+        generator of the results, in the order of the plugins.
+
+        By default each plugin is called after the previous one finished. If
+        ``concurrency`` is given the plugins are all called at once, or with
+        no more than ``concurrency`` of them running at the same time if it
+        is a number.
+        """
+
+        if not concurrency:
+            for method in self._methods(methodname):
+                yield await _result(method(*args, **kwargs))
+            return
+
+        tasks = self._tasks(self._methods(methodname), args, kwargs, concurrency)
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def afirst(self, methodname, *args, concurrency=None, **kwargs):
+        """Like ``first()``, awaiting the result of each plugin which is
+        awaitable. With ``concurrency``, the plugins are called at once as
+        with ``acall()``, and those still running are cancelled as soon as
+        the first result is known.
+        """
+
+        results = self.acall(methodname, *args, concurrency=concurrency, **kwargs)
+        try:
+            async for r in results:
+                if r is not None:
+                    return r
+        finally:
+            await results.aclose()
+
+        raise ValueError("No plugins returned a non-None value")
+
+    async def apipe(self, methodname, first_arg, *args, **kwargs):
+        """Like ``pipe()``, awaiting the result of each plugin which is
+        awaitable.
+        """
+
+        r = first_arg
+        for method in self._methods(methodname):
+            r = await _result(method(first_arg, *args, **kwargs))
+            if r is not None:
+                first_arg = r
+        return r
+
+    def pipe_stream(self, methodname, items, *args, chunksize=1000, **kwargs):
+        """Like ``pipe()`` for each of many items, returning a lazy iterator
+        of the results. The items are taken from ``items`` in chunks of
+        ``chunksize`` and passed through the plugins one chunk at a time.
+
+        A plugin can handle a whole chunk in one call by naming a batch
+        method for ``methodname`` in its ``__plugin__`` settings::
+
+            class __plugin__:
+                batch = {"filter": "filter_batch"}
+
+        The batch method is given a list of values and must return a
+        sequence of as many results, each meaning the same as the result of
+        the plugin's ``filter()`` for that value. It is only used when the
+        plugin also has the method itself.
+        """
+
+        stream = _chunks(items, chunksize)
+        for plugin in self._plugins:
+            method = getattr(plugin, methodname, None)
+            if method is None:
+                continue
+            meta = getattr(plugin, "__plugin__", None)
+            batchname = getattr(meta, "batch", {}).get(methodname)
+            batch = getattr(plugin, batchname, None) if batchname else None
+            if batch is not None:
+                stream = _batch_stage(stream, batch, args, kwargs)
+            else:
+                stream = _item_stage(stream, method, args, kwargs)
+        return itertools.chain.from_iterable(results for _, results in stream)
+
     def pipe(self, methodname, first_arg, *args, **kwargs):
         """Call a common method on all the plugins, if it exists. The return
         value of each call becomes the replaces the first argument in the given
@@ -0,0 +1,261 @@
+"""Plugins hosted by long-lived worker processes."""
+
+import multiprocessing
+import os
+import pickle
+import queue
+import sys
+
+from straight.plugin.loaders import ModuleLoader
+from straight.plugin.manager import PluginManager
+
+
+class WorkerError(RuntimeError):
+    """A worker process stopped, or could not be started, while handling a
+    call.
+    """
+
+
+def _send(conn, message):
+    try:
+        data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        error = WorkerError("Could not send %r: %s" % (message[0], e))
+        data = pickle.dumps(("error", error), pickle.HIGHEST_PROTOCOL)
+    conn.send_bytes(data)
+
+
+def _serve(conn, namespace, recurse, path):
+    """Load the plugins of a namespace and handle calls to them until the
+    host closes the connection.
+    """
+
+    sys.path[:] = path
+    try:
+        plugins = list(ModuleLoader(recurse=recurse).load(namespace))
+    except Exception as e:
+        _send(conn, ("error", e))
+        return
+    _send(conn, ("ready", len(plugins)))
+    manager = PluginManager(plugins)
+
+    while True:
+        try:
+            request = pickle.loads(conn.recv_bytes())
+        except EOFError:
+            return
+        if request is None:
+            return
+        operation, methodname, indices, args, kwargs = request
+        try:
+            if operation == "call":
+                selected = PluginManager([plugins[i] for i in indices])
+                reply = ("ok", list(selected.call(methodname, *args, **kwargs)))
+            elif operation == "first":
+                reply = ("ok", manager.first(methodname, *args, **kwargs))
+            else:
+                reply = ("ok", manager.pipe(methodname, *args, **kwargs))
+        except Exception as e:
+            reply = ("error", e)
+        _send(conn, reply)
+
+
+class _Worker(object):
+    def __init__(self, context, namespace, recurse):
+        self.context = context
+        self.namespace = namespace
+        self.recurse = recurse
+        self.process = None
+        self.conn = None
+
+    @property
+    def alive(self):
+        return self.conn is not None
+
+    def start(self):
+        self.conn, child = self.context.Pipe()
+        self.process = self.context.Process(
+            target=_serve,
+            args=(child, self.namespace, self.recurse, list(sys.path)),
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+
+    def ready(self):
+        """Wait for the plugins to be loaded, returning how many there are."""
+
+        return self.receive()
+
+    def send(self, request):
+        try:
+            self.conn.send_bytes(pickle.dumps(request, pickle.HIGHEST_PROTOCOL))
+        except (OSError, ValueError) as e:
+            self.stop()
+            raise WorkerError("Worker process stopped: %s" % e)
+
+    def receive(self):
+        try:
+            status, value = pickle.loads(self.conn.recv_bytes())
+        except (EOFError, OSError):
+            self.stop()
+            raise WorkerError(
+                "Worker process stopped with exit code %s" % self.process.exitcode
+            )
+        if status == "error":
+            raise value
+        return value
+
+    def stop(self, timeout=None):
+        if self.conn is not None:
+            try:
+                self.conn.send_bytes(pickle.dumps(None))
+            except (OSError, ValueError):
+                pass
+            self.conn.close()
+            self.conn = None
+        if self.process is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+
+
+class ProcessPluginManager(object):
+    """Plugins loaded once in each of a number of worker processes, which
+    handle the calls made to them. CPU-bound plugins can then use several
+    cores, without importing them again for every call.
+
+    Each worker finds the plugins of ``namespace`` with a ``ModuleLoader``,
+    using the ``sys.path`` of the host when the worker was started.
+    ``processes`` defaults to the number of CPUs. ``mp_context`` is a
+    ``multiprocessing`` context choosing how the workers are started.
+
+    ``call()`` spreads the plugins over the idle workers, which call them at
+    the same time. ``first()`` and ``pipe()`` are each handled by one worker,
+    and calls from several threads are handled by different workers at the
+    same time. Arguments and results are pickled.
+
+    A worker which stops while handling a call raises ``WorkerError`` for
+    that call, and is started again when it is next needed.
+    """
+
+    def __init__(self, namespace, processes=None, recurse=False, mp_context=None):
+        self.namespace = namespace
+        self.recurse = recurse
+        context = mp_context or multiprocessing.get_context()
+        processes = processes or os.cpu_count() or 1
+        self._workers = [_Worker(context, namespace, recurse) for _ in range(processes)]
+        self._idle = queue.Queue()
+        try:
+            for worker in self._workers:
+                worker.start()
+            counts = set(worker.ready() for worker in self._workers)
+        except BaseException:
+            self.close()
+            raise
+        if len(counts) != 1:
+            self.close()
+            raise WorkerError("Workers found different plugins in %s" % namespace)
+        self._count = counts.pop()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self, timeout=5):
+        """Stop all the worker processes."""
+
+        for worker in self._workers:
+            worker.stop(timeout)
+
+    def _checkout(self, block=True):
+        worker = self._idle.get(block)
+        if not worker.alive:
+            try:
+                worker.start()
+                worker.ready()
+            except BaseException:
+                worker.stop()
+                self._idle.put(worker)
+                raise
+        return worker
+
+    def _request(self, workers, requests):
+        """Send one request to each worker and wait for all the replies,
+        raising the first error once every worker has answered.
+        """
+
+        try:
+            errors = []
+            for worker, request in zip(workers, requests):
+                try:
+                    worker.send(request)
+                except WorkerError as e:
+                    errors.append(e)
+            values = []
+            for worker in workers:
+                if worker.alive:
+                    try:
+                        values.append(worker.receive())
+                    except Exception as e:
+                        errors.append(e)
+            if errors:
+                raise errors[0]
+            return values
+        finally:
+            for worker in workers:
+                self._idle.put(worker)
+
+    def call(self, methodname, *args, **kwargs):
+        """Call a common method on all the plugins, if it exists."""
+
+        if not self._count:
+            return
+        workers = [self._checkout()]
+        try:
+            while len(workers) < min(len(self._workers), self._count):
+                workers.append(self._checkout(block=False))
+        except queue.Empty:
+            pass
+        except BaseException:
+            for worker in workers:
+                self._idle.put(worker)
+            raise
+
+        indices = range(self._count)
+        size = -(-self._count // len(workers))
+        requests = [
+            ("call", methodname, indices[start : start + size], args, kwargs)
+            for start in range(0, self._count, size)
+        ]
+        for worker in workers[len(requests) :]:
+            self._idle.put(worker)
+        for values in self._request(workers[: len(requests)], requests):
+            for value in values:
+                yield value
+
+    def first(self, methodname, *args, **kwargs):
+        """Call a common method on all the plugins, if it exists. Return the
+        first result (the first non-None)
+        """
+
+        worker = self._checkout()
+        request = ("first", methodname, None, args, kwargs)
+        return self._request([worker], [request])[0]
+
+    def pipe(self, methodname, first_arg, *args, **kwargs):
+        """Call a common method on all the plugins, if it exists. The return
+        value of each call replaces the first argument passed to the next.
+        """
+
+        worker = self._checkout()
+        request = ("pipe", methodname, None, (first_arg,) + args, kwargs)
+        return self._request([worker], [request])[0]
@@ -1,12 +1,25 @@
 #!/usr/bin/env python
 
+import asyncio
+import compileall
+import importlib
 import os
+import shutil
 import sys
+import tempfile
+import threading
+import time
+import tracemalloc
 import unittest
-from types import ModuleType
+import weakref
+import zipfile
+import zipimport
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType, SimpleNamespace
 from unittest import mock
 
-from straight.plugin import loaders, manager
+from straight.plugin import loaders, manager, workers
 
 try:
     skipIf = unittest.skipIf
@@ -65,6 +78,35 @@ class LoaderTestCaseMixin(object):
                 del sys.modules[modname]
 
 
+class TemporaryPackageMixin(LoaderTestCaseMixin):
+    """Loads plugins written by ``write()`` to a temporary directory, which
+    is added to ``sys.path`` after ``paths``.
+    """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.paths = tuple(self.paths) + (self.tmpdir,)
+        super(TemporaryPackageMixin, self).setUp()
+
+    def write(self, name, source):
+        """Write a file, given by its ``/`` separated path in the temporary
+        directory, creating the directories it is in.
+        """
+
+        path = os.path.join(self.tmpdir, *name.split("/"))
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        existed = os.path.exists(path)
+        with open(path, "w") as f:
+            f.write(source)
+        if existed:
+            # Make sure the change is seen, however coarse the file times are
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        importlib.invalidate_caches()
+
+
 class ModuleLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
 
     paths = (
@@ -83,6 +125,63 @@ class ModuleLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
     def test_plugin(self):
         assert self.loader.load("testplugin")[0].do(1) == 2
 
+    def test_load_keyword(self):
+        modules = list(self.loader.load(namespace="testplugin"))
+        assert len(modules) == 2, modules
+
+
+class LazyModuleLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
+
+    paths = (
+        os.path.join(os.path.dirname(__file__), "test-packages", "more-test-plugins"),
+        os.path.join(os.path.dirname(__file__), "test-packages", "some-test-plugins"),
+    )
+
+    def setUp(self):
+        self.loader = loaders.ModuleLoader(lazy=True)
+        super(LazyModuleLoaderTestCase, self).setUp()
+
+    def test_load_defers_import(self):
+        modules = list(self.loader.load("testplugin"))
+        self.assertEqual(len(modules), 2)
+        self.assertNotIn("testplugin.bar", sys.modules)
+        self.assertTrue(all(not m.loaded for m in modules))
+
+    def test_first_imports_only_reached_plugins(self):
+        plugins = self.loader.load("testplugin")
+        self.assertEqual(plugins.first("do", 1), 2)
+        self.assertTrue(plugins[0].loaded)
+        self.assertFalse(plugins[1].loaded)
+
+
+class LazyImplyLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
+
+    paths = (os.path.join(os.path.dirname(__file__), "test-packages", "imply-plugins"),)
+
+    def setUp(self):
+        self.loader = loaders.ModuleLoader(lazy=True)
+        super(LazyImplyLoaderTestCase, self).setUp()
+
+    def test_load(self):
+        modules = list(self.loader.load("testplugin"))
+        assert len(modules) == 1, modules
+        self.assertFalse(modules[0].loaded)
+        self.assertEqual(modules[0].__name__, "testplugin_2.bar")
+
+
+class ShadowedModuleLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
+
+    paths = (
+        os.path.join(os.path.dirname(__file__), "test-packages", "some-test-plugins"),
+        os.path.join(os.path.dirname(__file__), "test-packages", "imply-plugins"),
+    )
+
+    def test_first_path_entry_wins(self):
+        modules = list(loaders.ModuleLoader().load("testplugin"))
+
+        self.assertEqual(len(modules), 1)
+        self.assertIn("some-test-plugins", modules[0].__file__)
+
 
 class ImpliedNamespaceModuleTestCase(LoaderTestCaseMixin, unittest.TestCase):
 
@@ -118,6 +217,414 @@ class ImplyLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
         assert len(modules) == 1, modules
         assert modules[0].__name__ == "testplugin_2.bar", modules[0].__name__
 
+    def test_disabled_plugin_not_imported(self):
+        self.loader.load("testplugin")
+        self.assertNotIn("testplugin.foo", sys.modules)
+
+
+class ImplyGraphTestCase(TemporaryPackageMixin, unittest.TestCase):
+    def setUp(self):
+        super(ImplyGraphTestCase, self).setUp()
+        implies = "class __plugin__:\n    imply_plugins = %r\n"
+        self.write("testplugin/a.py", implies % (("testplugin_b", "testplugin_c"),))
+        self.write("testplugin_b/b.py", implies % (("testplugin_d", "testplugin"),))
+        self.write("testplugin_c/c.py", implies % (("testplugin_d",),))
+        self.write("testplugin_d/d.py", "")
+
+    def write(self, name, source):
+        # Each namespace is a package
+        package = name.rpartition("/")[0]
+        if package and not os.path.isdir(os.path.join(self.tmpdir, package)):
+            super(ImplyGraphTestCase, self).write(package + "/__init__.py", "")
+        super(ImplyGraphTestCase, self).write(name, source)
+
+    def test_each_namespace_once(self):
+        loader = loaders.ModuleLoader()
+        with mock.patch.object(
+            loader, "_fill_cache", wraps=loader._fill_cache
+        ) as fill_cache:
+            modules = list(loader.load("testplugin"))
+
+        self.assertEqual(
+            [m.__name__ for m in modules],
+            ["testplugin.a", "testplugin_b.b", "testplugin_d.d", "testplugin_c.c"],
+        )
+        self.assertEqual(
+            [c[0][0] for c in fill_cache.call_args_list],
+            ["testplugin", "testplugin_b", "testplugin_d", "testplugin_c"],
+        )
+
+    def test_implied_by_priority(self):
+        self.write("testplugin_d/d.py", "class __plugin__:\n    priority = 1\n")
+        modules = list(loaders.ModuleLoader().load("testplugin"))
+
+        self.assertEqual(modules[0].__name__, "testplugin_d.d")
+        self.assertEqual(len(modules), 4)
+
+    def test_subclasses_passed_on(self):
+        self.write("testplugin_base.py", "class Base(object):\n    pass\n")
+        self.write(
+            "testplugin_e/e.py",
+            "from testplugin_base import Base\n\n\n"
+            "class E(Base):\n"
+            "    class __plugin__:\n"
+            "        imply_plugins = ('testplugin_f',)\n\n\n"
+            "class Other(object):\n"
+            "    pass\n",
+        )
+        self.write(
+            "testplugin_f/f.py",
+            "from testplugin_base import Base\n\n\n"
+            "class F(Base):\n"
+            "    pass\n\n\n"
+            "class Unrelated(object):\n"
+            "    pass\n",
+        )
+        base = importlib.import_module("testplugin_base")
+        classes = loaders.ClassLoader().load("testplugin_e", subclasses=base.Base)
+
+        self.assertEqual([c.__name__ for c in classes], ["E", "F"])
+
+
+class StaticMetaTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def meta(self, source):
+        path = os.path.join(self.tmpdir, "plugin.py")
+        with open(path, "w") as f:
+            f.write(source)
+        return loaders.read_static_meta(path)
+
+    def test_literal(self):
+        meta = loaders.read_static_meta(
+            os.path.join(
+                os.path.dirname(__file__),
+                "test-packages",
+                "imply-plugins",
+                "testplugin",
+                "foo.py",
+            )
+        )
+        self.assertEqual(meta.imply_plugins, ("testplugin_2",))
+        self.assertFalse(meta.load)
+
+    def test_no_meta(self):
+        self.assertIsNone(self.meta("def do(x):\n    return x\n"))
+
+    def test_unrelated_mentions(self):
+        meta = self.meta(
+            '"""Uses __plugin__."""\nclass __plugin__:\n    priority = 1\n'
+        )
+        self.assertEqual(meta.priority, 1)
+
+    def test_object_base(self):
+        meta = self.meta("class __plugin__(object):\n    priority = 1\n")
+        self.assertEqual(meta.priority, 1)
+
+    def test_nested_meta_ignored(self):
+        self.assertIsNone(self.meta("class A:\n    class __plugin__:\n        pass\n"))
+
+    def test_dynamic(self):
+        dynamic = (
+            "class __plugin__:\n    priority = compute()\n",
+            "class __plugin__(Base):\n    priority = 1\n",
+            "class __plugin__(object, Base):\n    priority = 1\n",
+            "__plugin__ = make_meta()\n",
+            "from elsewhere import __plugin__\n",
+            "if X:\n    class __plugin__:\n        pass\n",
+            "class __plugin__:\n    for load in (True,):\n        pass\n",
+            "class __plugin__:\n    load = True\n__plugin__.load = False\n",
+            "class __plugin__:\n    load = True\nsetattr(__plugin__, 'load', False)\n",
+            "class __plugin__:\n    pass\nsys.modules[__name__].__plugin__.load = 0\n",
+            "class __plugin__:\n    pass\ndef f():\n    __plugin__.priority = 2\n",
+        )
+        for source in dynamic:
+            self.assertIs(self.meta(source), loaders.DYNAMIC, source)
+
+
+class ZipModuleLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.archive = os.path.join(self.tmpdir, "plugins.pyz")
+        self.build()
+        self.paths = (self.archive,)
+        super(ZipModuleLoaderTestCase, self).setUp()
+
+    def build(self, **extra):
+        existed = os.path.exists(self.archive)
+        with zipfile.ZipFile(self.archive, "w") as zf:
+            zf.writestr("testplugin/__init__.py", "")
+            zf.writestr("testplugin/foo.py", "def do(x):\n    return x + 1\n")
+            zf.writestr("testplugin/bar/__init__.py", "def do(x):\n    return x + 2\n")
+            zf.writestr("testplugin/bar/baz.py", "def do(x):\n    return x + 3\n")
+            zf.writestr("testplugin/data/readme.txt", "")
+            for name, source in extra.items():
+                zf.writestr("testplugin/%s.py" % name, source)
+        if existed:
+            st = os.stat(self.archive)
+            os.utime(self.archive, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+            # zipimport keeps the old table of contents otherwise
+            for path in list(sys.path_importer_cache):
+                if path.startswith(self.archive):
+                    del sys.path_importer_cache[path]
+            zipimport._zip_directory_cache.pop(self.archive, None)
+
+    def tearDown(self):
+        super(ZipModuleLoaderTestCase, self).tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def test_load(self):
+        plugins = loaders.ModuleLoader().load("testplugin")
+
+        self.assertEqual(set(p.do(1) for p in plugins), set((2, 3)))
+
+    def test_load_recursive(self):
+        plugins = loaders.ModuleLoader(recurse=True).load("testplugin")
+
+        self.assertEqual(set(p.do(1) for p in plugins), set((2, 3, 4)))
+
+    def test_archive_read_once(self):
+        loaders.ModuleLoader(recurse=True).load("testplugin")
+        with mock.patch("zipfile.ZipFile", side_effect=AssertionError) as zf:
+            loaders.ModuleLoader(recurse=True).load("testplugin")
+        self.assertFalse(zf.called)
+
+    def test_failure_retried_when_rebuilt(self):
+        self.addCleanup(loaders.clear_import_failures)
+        self.build(broken="import testplugin_missing_dependency\n")
+
+        def imports():
+            with mock.patch.object(
+                loaders, "import_module", wraps=importlib.import_module
+            ) as import_module:
+                plugins = loaders.ModuleLoader().load("testplugin")
+            self.assertEqual(plugins.errors[0].module, "testplugin.broken")
+            return [c[0][0] for c in import_module.call_args_list]
+
+        self.assertIn("testplugin.broken", imports())
+        self.assertNotIn("testplugin.broken", imports())
+        self.build(broken="import testplugin_still_missing\n")
+        self.assertIn("testplugin.broken", imports())
+
+
+@skipIf(loaders.metadata is None, "importlib.metadata is not available")
+class EntryPointLoaderTestCase(TemporaryPackageMixin, unittest.TestCase):
+
+    paths = (
+        os.path.join(os.path.dirname(__file__), "test-packages", "some-test-plugins"),
+    )
+
+    def setUp(self):
+        super(EntryPointLoaderTestCase, self).setUp()
+        self.add_distribution(
+            "epplugins",
+            "[testplugin]\nextra = testplugin_ep\nthing = testplugin_ep:Thing\n",
+        )
+        self.write(
+            "testplugin_ep.py",
+            "class __plugin__:\n"
+            "    priority = 1.0\n\n\n"
+            "def do(x):\n"
+            "    return x + 10\n\n\n"
+            "class Thing(object):\n"
+            "    pass\n",
+        )
+
+    def add_distribution(self, name, entry_points):
+        dist_info = "%s-1.0.dist-info" % name
+        self.write(
+            dist_info + "/METADATA",
+            "Metadata-Version: 2.1\nName: %s\nVersion: 1.0\n" % name,
+        )
+        self.write(dist_info + "/entry_points.txt", entry_points)
+
+    def test_not_loaded_by_default(self):
+        plugins = loaders.ModuleLoader().load("testplugin")
+        self.assertEqual(len(plugins), 1)
+
+    def test_merged_by_priority(self):
+        plugins = loaders.ModuleLoader(entry_points=True).load("testplugin")
+
+        self.assertEqual(len(plugins), 3)
+        self.assertEqual(plugins[0].__name__, "testplugin_ep")
+        self.assertEqual(plugins.first("do", 1), 11)
+        self.assertEqual(plugins[2].__name__, "Thing")
+
+    def test_unified_load(self):
+        self.addCleanup(loaders.unified_load.cache_clear)
+        plugins = loaders.unified_load("testplugin", entry_points=True)
+
+        self.assertEqual(len(plugins), 3)
+
+    def test_index_invalidated(self):
+        self.assertIn("testplugin", loaders.entry_point_index())
+        self.add_distribution("more", "[testplugin.more]\nmore = testplugin_ep\n")
+        os.utime(self.tmpdir, ns=(0, 0))
+
+        self.assertIn("testplugin.more", loaders.entry_point_index())
+
+    def test_index_recorded(self):
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir)
+        index = loaders.DiscoveryIndex(os.path.join(index_dir, "index.json"))
+        loaders.ModuleLoader(entry_points=True).load("testplugin")
+        loaders._entry_point_index = None
+        loaders.ModuleLoader(entry_points=True, index=index).load("testplugin")
+        loaders._entry_point_index = None
+
+        with mock.patch.object(loaders, "metadata") as metadata:
+            plugins = loaders.ModuleLoader(entry_points=True, index=index.path).load(
+                "testplugin"
+            )
+        self.assertFalse(metadata.distributions.called)
+        self.assertEqual(len(plugins), 3)
+
+
+class ReloadTestCase(TemporaryPackageMixin, unittest.TestCase):
+    def setUp(self):
+        super(ReloadTestCase, self).setUp()
+        self.plugins = os.path.join(self.tmpdir, "testplugin")
+        self.write("testplugin/__init__.py", "")
+        self.write("testplugin/foo.py", "def do(x):\n    return x + 1\n")
+        self.write(
+            "testplugin/bar.py",
+            "class __plugin__:\n    priority = 1\n\n\ndef do(x):\n    return x + 2\n",
+        )
+
+    def test_unchanged(self):
+        plugins = loaders.ModuleLoader().load("testplugin")
+        modules = list(plugins)
+
+        self.assertFalse(plugins.reload())
+        self.assertEqual(modules, list(plugins))
+
+    def test_changed(self):
+        plugins = loaders.ModuleLoader().load("testplugin")
+        foo = plugins[1]
+        self.write("testplugin/foo.py", "def do(x):\n    return x + 100\n")
+
+        self.assertTrue(plugins.reload())
+        self.assertIs(plugins[1], foo)
+        self.assertEqual(foo.do(1), 101)
+
+    def test_broken(self):
+        self.addCleanup(loaders.clear_import_failures)
+        plugins = loaders.ModuleLoader().load("testplugin")
+        self.write("testplugin/foo.py", "import testplugin_missing_dependency\n")
+
+        self.assertTrue(plugins.reload())
+        self.assertEqual(list(plugins.call("do", 1)), [3])
+        self.assertEqual([e.module for e in plugins.errors], ["testplugin.foo"])
+        self.assertNotIn("testplugin.foo", sys.modules)
+
+        plugins.reload()
+        self.assertEqual([e.module for e in plugins.errors], ["testplugin.foo"])
+
+        self.write("testplugin/foo.py", "def do(x):\n    return x +\n")
+        plugins.reload()
+        self.assertIsInstance(plugins.errors[0].error, SyntaxError)
+
+        self.write("testplugin/foo.py", "def do(x):\n    return x + 100\n")
+        self.assertTrue(plugins.reload())
+        self.assertEqual(sorted(plugins.call("do", 1)), [3, 101])
+        self.assertEqual(plugins.errors, [])
+
+    def test_broken_strict(self):
+        self.addCleanup(loaders.clear_import_failures)
+        plugins = loaders.ModuleLoader(strict=True).load("testplugin")
+        self.write("testplugin/foo.py", "import testplugin_missing_dependency\n")
+
+        with self.assertRaises(loaders.PluginImportError):
+            plugins.reload()
+        self.assertTrue(plugins._loader.loaded)
+
+    def test_reordered(self):
+        plugins = loaders.ModuleLoader().load("testplugin")
+        self.write(
+            "testplugin/foo.py",
+            "class __plugin__:\n    priority = 2\n\n\ndef do(x):\n    return x + 1\n",
+        )
+
+        self.assertTrue(plugins.reload())
+        self.assertEqual(
+            [p.__name__ for p in plugins], ["testplugin.foo", "testplugin.bar"]
+        )
+
+    def test_added_and_removed(self):
+        plugins = loaders.ModuleLoader().load("testplugin")
+        self.write("testplugin/baz.py", "def do(x):\n    return x + 3\n")
+        os.unlink(os.path.join(self.plugins, "foo.py"))
+
+        self.assertTrue(plugins.reload())
+        self.assertEqual(set(p.do(1) for p in plugins), set((3, 4)))
+        self.assertNotIn("testplugin.foo", sys.modules)
+
+    def test_iteration_sees_old_set(self):
+        plugins = loaders.ModuleLoader().load("testplugin")
+        iterator = iter(plugins)
+        self.write("testplugin/baz.py", "def do(x):\n    return x + 3\n")
+        plugins.reload()
+
+        self.assertEqual(len(list(iterator)), 2)
+        self.assertEqual(len(plugins), 3)
+
+    def test_class_loader(self):
+        plugins = loaders.ClassLoader().load("testplugin")
+        self.assertEqual(len(plugins), 0)
+        self.write("testplugin/foo.py", "class Foo(object):\n    pass\n")
+
+        self.assertTrue(plugins.reload())
+        self.assertEqual([c.__name__ for c in plugins], ["Foo"])
+
+    def test_unified_load_cache_cleared(self):
+        self.addCleanup(loaders.unified_load.cache_clear)
+        plugins = loaders.unified_load("testplugin")
+        self.write("testplugin/baz.py", "def do(x):\n    return x + 3\n")
+        plugins.reload()
+
+        self.assertEqual(len(loaders.unified_load("testplugin")), 3)
+
+
+class FilterLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
+
+    paths = (
+        os.path.join(os.path.dirname(__file__), "test-packages", "more-test-plugins"),
+        os.path.join(os.path.dirname(__file__), "test-packages", "some-test-plugins"),
+    )
+
+    def names(self, plugins):
+        return sorted(p.__name__ for p in plugins)
+
+    def test_include(self):
+        plugins = loaders.ModuleLoader(include="testplugin.foo").load("testplugin")
+        self.assertEqual(self.names(plugins), ["testplugin.foo"])
+        self.assertNotIn("testplugin.bar", sys.modules)
+
+    def test_exclude(self):
+        plugins = loaders.ModuleLoader(exclude=["b*"]).load("testplugin")
+        self.assertEqual(self.names(plugins), ["testplugin.foo"])
+        self.assertNotIn("testplugin.bar", sys.modules)
+
+    def test_unified_load(self):
+        plugins = loaders.unified_load(
+            "testplugin", include=["foo", "bar"], exclude=["bar"]
+        )
+        self.assertEqual(self.names(plugins), ["testplugin.foo"])
+
+
+class ImpliedFilterLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
+
+    paths = (os.path.join(os.path.dirname(__file__), "test-packages", "imply-plugins"),)
+
+    def test_exclude(self):
+        plugins = loaders.ModuleLoader(exclude="testplugin_2.*").load("testplugin")
+        self.assertEqual(list(plugins), [])
+        self.assertNotIn("testplugin_2.bar", sys.modules)
+
 
 class ObjectLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
 
@@ -158,6 +665,73 @@ class ClassLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
         self.assertEqual(len(classes), 1)
         self.assertTrue(classes[0] is testclasses.A1)
 
+    def test_load_keyword(self):
+        from testplugin import testclasses
+
+        classes = self.loader.load(namespace="testplugin", subclasses=testclasses.A)
+
+        self.assertEqual(list(classes), [testclasses.A1])
+
+
+class ClassDiscoveryTestCase(TemporaryPackageMixin, unittest.TestCase):
+    def setUp(self):
+        super(ClassDiscoveryTestCase, self).setUp()
+        self.write(
+            "testplugin_base.py",
+            "class Base(object):\n    pass\n\n\nclass Imported(Base):\n    pass\n",
+        )
+        self.write("testplugin/__init__.py", "")
+        self.write(
+            "testplugin/classes.py",
+            "import os\n"
+            "from testplugin_base import Base, Imported\n\n\n"
+            "class Zed(Base):\n    pass\n\n\n"
+            "class Alpha(Zed):\n    pass\n\n\n"
+            "class Unrelated(object):\n    pass\n\n\n"
+            "def helper():\n    pass\n\n\n"
+            "Alias = Alpha\n",
+        )
+        self.write(
+            "testplugin/exporting.py",
+            "from testplugin_base import Base\n\n"
+            "__all__ = ['Exported']\n\n\n"
+            "class Exported(Base):\n    pass\n\n\n"
+            "class Hidden(Base):\n    pass\n",
+        )
+        self.base = importlib.import_module("testplugin_base")
+
+    def names(self, plugins):
+        return [getattr(p, "__name__", p) for p in plugins]
+
+    def test_all_respected(self):
+        classes = loaders.ClassLoader().load("testplugin", subclasses=self.base.Base)
+
+        self.assertEqual(self.names(classes), ["Alpha", "Imported", "Zed", "Exported"])
+
+    def test_local_only(self):
+        loader = loaders.ClassLoader(local_only=True)
+
+        self.assertEqual(
+            self.names(loader.load("testplugin")),
+            ["Alpha", "Unrelated", "Zed", "Exported"],
+        )
+
+    def test_local_only_subclasses(self):
+        loader = loaders.ClassLoader(local_only=True)
+        with mock.patch.object(loaders.ObjectLoader, "_objects") as objects:
+            classes = loader.load("testplugin", subclasses=self.base.Base)
+
+        self.assertFalse(objects.called)
+        self.assertEqual(self.names(classes), ["Alpha", "Zed", "Exported"])
+
+    def test_objects_local_only(self):
+        objects = loaders.ObjectLoader(local_only=True).load("testplugin")
+
+        self.assertEqual(
+            self.names(objects),
+            ["Alpha", "Unrelated", "Zed", "helper", "Exported"],
+        )
+
 
 class PriorityLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
 
@@ -209,6 +783,53 @@ class PackageLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
         self.assertEqual(results, set((2, 3, 4)))
 
 
+class ParallelPackageLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
+    paths = (
+        os.path.join(
+            os.path.dirname(__file__), "test-packages", "package-test-plugins"
+        ),
+    )
+
+    def test_same_order_as_serial(self):
+        serial = loaders.ModuleLoader(recurse=True).load("testplugin")
+        self.tearDown()
+        self.setUp()
+        parallel = loaders.ModuleLoader(recurse=True, workers=4).load("testplugin")
+
+        self.assertEqual([m.__name__ for m in serial], [m.__name__ for m in parallel])
+        for module in parallel:
+            self.assertTrue(isinstance(module, ModuleType))
+
+
+class ParallelMetaTestCase(TemporaryPackageMixin, unittest.TestCase):
+    def setUp(self):
+        super(ParallelMetaTestCase, self).setUp()
+        self.write("testplugin/__init__.py", "")
+        for i in range(3):
+            self.write(
+                "testplugin/p%d.py" % i,
+                "import threading\n"
+                "thread = threading.current_thread()\n\n\n"
+                "class __plugin__:\n    priority = int(%r)\n" % str(i),
+            )
+
+    def test_imported_in_pool(self):
+        plugins = loaders.ModuleLoader(workers=3).load("testplugin")
+
+        self.assertEqual(
+            [p.__name__ for p in plugins],
+            ["testplugin.p2", "testplugin.p1", "testplugin.p0"],
+        )
+        for plugin in plugins:
+            self.assertIsNot(plugin.thread, threading.main_thread())
+
+    def test_serial(self):
+        plugins = loaders.ModuleLoader().load("testplugin")
+
+        for plugin in plugins:
+            self.assertIs(plugin.thread, threading.main_thread())
+
+
 class RecursingPackageLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
     paths = (
         os.path.join(
@@ -241,6 +862,929 @@ class RecursingPackageLoaderTestCase(LoaderTestCaseMixin, unittest.TestCase):
         self.assertEqual(results, set((2, 3, 4, "quu")))
 
 
+class DiscoveryIndexTestCase(LoaderTestCaseMixin, unittest.TestCase):
+
+    paths = (
+        os.path.join(os.path.dirname(__file__), "test-packages", "more-test-plugins"),
+    )
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.tmpdir, "index.json")
+        self.plugins = os.path.join(self.tmpdir, "plugins")
+        shutil.copytree(
+            os.path.join(
+                os.path.dirname(__file__), "test-packages", "some-test-plugins"
+            ),
+            self.plugins,
+        )
+        self.paths = self.paths + (self.plugins,)
+        super(DiscoveryIndexTestCase, self).setUp()
+
+    def tearDown(self):
+        super(DiscoveryIndexTestCase, self).tearDown()
+        shutil.rmtree(self.tmpdir)
+
+    def load(self):
+        for modname in list(sys.modules):
+            if modname.startswith("testplugin"):
+                del sys.modules[modname]
+        return list(loaders.ModuleLoader(index=self.index_path).load("testplugin"))
+
+    def test_index_written(self):
+        self.assertEqual(len(self.load()), 2)
+        index = loaders.DiscoveryIndex(self.index_path)
+        self.assertIn(os.path.join(self.plugins, "testplugin"), index.entries)
+
+    def test_warm_load_skips_listing(self):
+        self.load()
+        with mock.patch("os.listdir", side_effect=AssertionError) as listdir:
+            self.assertEqual(len(self.load()), 2)
+        self.assertFalse(listdir.called)
+
+    def test_stale_entry_rescanned(self):
+        self.load()
+        with open(os.path.join(self.plugins, "testplugin", "baz.py"), "w") as f:
+            f.write("def do(x):\n    return x + 3\n")
+        importlib.invalidate_caches()
+        self.assertEqual(len(self.load()), 3)
+
+    def test_corrupt_index(self):
+        with open(self.index_path, "w") as f:
+            f.write("{not json")
+        self.assertEqual(len(self.load()), 2)
+        self.assertEqual(len(loaders.DiscoveryIndex(self.index_path).entries), 2)
+
+    def test_unwritable_index(self):
+        self.index_path = os.path.join(self.tmpdir, "missing", "index.json")
+        self.assertEqual(len(self.load()), 2)
+        self.assertFalse(os.path.exists(self.index_path))
+
+
+class FilesystemCallCounter(object):
+    """Counts the filesystem calls made while it is active."""
+
+    calls = ("scandir", "listdir", "stat", "lstat")
+
+    def __enter__(self):
+        self.counts = dict.fromkeys(self.calls, 0)
+        self.patches = []
+        for name in self.calls:
+            patch = mock.patch.object(os, name, side_effect=self.counting(name))
+            patch.start()
+            self.patches.append(patch)
+        return self.counts
+
+    def __exit__(self, *exc_info):
+        for patch in self.patches:
+            patch.stop()
+
+    def counting(self, name):
+        func = getattr(os, name)
+
+        def count(*args, **kwargs):
+            self.counts[name] += 1
+            return func(*args, **kwargs)
+
+        return count
+
+
+class FilesystemCallsTestCase(LoaderTestCaseMixin, unittest.TestCase):
+    paths = (
+        os.path.join(
+            os.path.dirname(__file__), "test-packages", "package-test-plugins"
+        ),
+    )
+
+    def setUp(self):
+        super(FilesystemCallsTestCase, self).setUp()
+        # The counts do not depend on whether bytecode was written
+        compileall.compile_dir(self.paths[0], quiet=1)
+
+    def find(self, **kwargs):
+        loader = loaders.ModuleLoader(**kwargs)
+        # pkgutil.extend_path checks every sys.path entry when it is imported
+        importlib.import_module("testplugin")
+        with FilesystemCallCounter() as counts:
+            filepaths = list(loader._findPluginFilePaths("testplugin"))
+        return filepaths, counts
+
+    def test_scan(self):
+        filepaths, counts = self.find()
+
+        self.assertEqual(len(filepaths), 3)
+        self.assertEqual(counts["listdir"], 0)
+        self.assertEqual(counts["scandir"], 1)
+        # One package check for each of bar, baz and foo
+        self.assertEqual(counts["stat"], 3)
+
+    def test_recursive_scan(self):
+        filepaths, counts = self.find(recurse=True)
+
+        self.assertEqual(len(filepaths), 4)
+        # The namespace, bar, baz, baz.quu and foo are each listed once
+        self.assertEqual(counts["scandir"], 5)
+        self.assertEqual(counts["stat"], 4)
+
+    def test_indexed_scan(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        index = os.path.join(tmpdir, "index.json")
+        loaders.ModuleLoader(index=index).load("testplugin")
+
+        filepaths, counts = self.find(index=index)
+
+        self.assertEqual(len(filepaths), 3)
+        self.assertEqual(counts["scandir"], 0)
+        # The namespace directory, and then bar, baz and foo
+        self.assertEqual(counts["stat"], 4)
+
+
+class DiscoveryContextTestCase(LoaderTestCaseMixin, unittest.TestCase):
+    paths = FilesystemCallsTestCase.paths
+
+    def setUp(self):
+        self.context = loaders.DiscoveryContext()
+        super(DiscoveryContextTestCase, self).setUp()
+        importlib.import_module("testplugin")
+
+    def test_listed_once(self):
+        loaders.ModuleLoader(recurse=True, context=self.context).load("testplugin")
+        loader = loaders.ModuleLoader(context=self.context)
+        with FilesystemCallCounter() as counts:
+            filepaths = list(loader._findPluginFilePaths("testplugin"))
+
+        self.assertEqual(len(filepaths), 3)
+        self.assertEqual(counts["scandir"], 0)
+        self.assertEqual(counts["stat"], 0)
+
+    def test_handles_shared(self):
+        modules = loaders.ModuleLoader(lazy=True, context=self.context).load(
+            "testplugin"
+        )
+        loader = loaders.ClassLoader(context=self.context)
+        loader.load("testplugin")
+
+        self.assertEqual(
+            list(loader.module_loader._handles.values()),
+            [m._lazy_handle for m in modules],
+        )
+        self.assertTrue(all(m.loaded for m in modules))
+
+    def test_collector_per_loader(self):
+        lazy = loaders.LoadCollector()
+        modules = loaders.ModuleLoader(
+            lazy=True, context=self.context, collector=lazy
+        ).load("testplugin")
+        collector = loaders.LoadCollector()
+        loaders.ModuleLoader(context=self.context, collector=collector).load(
+            "testplugin"
+        )
+
+        imports = collector.report()["imports"]
+        self.assertEqual(
+            sorted(i["module"] for i in imports),
+            sorted(m._lazy_name for m in modules),
+        )
+        self.assertEqual(lazy.report()["imports"], [])
+
+    def test_unified_load(self):
+        self.addCleanup(loaders.unified_load.cache_clear)
+        loaders.unified_load("testplugin", context=self.context)
+        with FilesystemCallCounter() as counts:
+            loaders.unified_load("testplugin", recurse=True, context=self.context)
+
+        # Only the packages' own directories are new
+        self.assertEqual(counts["scandir"], 4)
+
+    def test_reload_clears(self):
+        plugins = loaders.ModuleLoader(context=self.context).load("testplugin")
+        with FilesystemCallCounter() as counts:
+            plugins.reload()
+
+        self.assertEqual(counts["scandir"], 1)
+
+
+class FrozenRegistryTestCase(TemporaryPackageMixin, unittest.TestCase):
+
+    paths = (os.path.join(os.path.dirname(__file__), "test-packages", "imply-plugins"),)
+
+    def setUp(self):
+        super(FrozenRegistryTestCase, self).setUp()
+        self.registry = os.path.join(self.tmpdir, "testplugin_registry.py")
+        self.addCleanup(loaders.load_registry, None)
+        self.addCleanup(loaders.unified_load.cache_clear)
+
+    def test_resolved(self):
+        loaders.freeze("testplugin", path=self.registry)
+        registry = loaders.FrozenRegistry.from_module("testplugin_registry")
+
+        self.assertEqual(registry.lookup("testplugin"), ["testplugin_2.bar"])
+        self.assertIsNone(registry.lookup("testplugin", recurse=True))
+        self.assertIsNone(registry.lookup("testplugin_2"))
+
+    def test_unified_load(self):
+        loaders.freeze(["testplugin"], path=self.registry)
+        loaders.load_registry("testplugin_registry")
+        importlib.import_module("testplugin")
+        with FilesystemCallCounter() as counts:
+            plugins = loaders.unified_load("testplugin")
+
+        self.assertEqual([p.__name__ for p in plugins], ["testplugin_2.bar"])
+        self.assertEqual(counts["scandir"], 0)
+        self.assertNotIn("testplugin.foo", sys.modules)
+
+    def test_filtered(self):
+        loaders.freeze("testplugin", path=self.registry)
+
+        def names(**kwargs):
+            loaders.unified_load.cache_clear()
+            return [p.__name__ for p in loaders.unified_load("testplugin", **kwargs)]
+
+        for registry in (None, "testplugin_registry"):
+            loaders.load_registry(registry)
+            self.assertEqual(names(exclude=["foo"]), [])
+            self.assertEqual(names(include=["foo", "bar"]), ["testplugin_2.bar"])
+
+    def test_changed(self):
+        loaders.freeze("testplugin_2", path=self.registry)
+        loaders.load_registry("testplugin_registry")
+        directory = os.path.dirname(loaders.unified_load("testplugin_2")[0].__file__)
+        st = os.stat(directory)
+        self.addCleanup(os.utime, directory, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.utime(directory, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        loaders.unified_load.cache_clear()
+
+        with FilesystemCallCounter() as counts:
+            plugins = loaders.unified_load("testplugin_2")
+        self.assertEqual(len(plugins), 1)
+        self.assertEqual(counts["scandir"], 1)
+
+    def test_environment(self):
+        loaders.freeze("testplugin", path=self.registry)
+        with mock.patch.dict(
+            os.environ, STRAIGHT_PLUGIN_REGISTRY="testplugin_registry"
+        ):
+            with mock.patch.object(loaders, "_registry_checked", False):
+                registry = loaders._active_registry()
+
+        self.assertEqual(registry.lookup("testplugin"), ["testplugin_2.bar"])
+
+    def test_environment_invalid(self):
+        self.write(
+            "testplugin_registry.py",
+            "PLUGINS = {('testplugin', False): {'modules': []}}\n",
+        )
+        self.write("testplugin_broken.py", "REGISTRY = {}\n")
+
+        for name in ("testplugin_missing", "testplugin_broken", "testplugin_registry"):
+            with mock.patch.dict(os.environ, STRAIGHT_PLUGIN_REGISTRY=name):
+                with mock.patch.object(loaders, "_registry_checked", False):
+                    plugins = loaders.unified_load("testplugin")
+                    self.assertTrue(loaders._registry_checked)
+            loaders.unified_load.cache_clear()
+
+            self.assertEqual([p.__name__ for p in plugins], ["testplugin_2.bar"])
+
+    def test_command(self):
+        from straight.plugin import __main__
+
+        __main__.main(["freeze", "testplugin", "--recurse", "-o", self.registry])
+        registry = loaders.FrozenRegistry.from_module("testplugin_registry")
+
+        self.assertEqual(registry.lookup("testplugin", True), ["testplugin_2.bar"])
+
+
+class UnloadTestCase(TemporaryPackageMixin, unittest.TestCase):
+    def setUp(self):
+        super(UnloadTestCase, self).setUp()
+        self.write("testplugin_lib.py", "VALUE = 1\n")
+        self.write("testplugin/__init__.py", "")
+        self.write("testplugin/helpers/__init__.py", "")
+        self.write("testplugin/helpers/util.py", "def double(x):\n    return x * 2\n")
+        self.write(
+            "testplugin/a.py",
+            "import testplugin_lib\n"
+            "from testplugin.helpers.util import double\n\n\n"
+            "class Plugin(object):\n"
+            "    def do(self, x):\n"
+            "        return double(x)\n",
+        )
+
+    def test_modules_collected(self):
+        plugins = loaders.ModuleLoader().load("testplugin")
+        module = weakref.ref(plugins[0])
+        helper = weakref.ref(sys.modules["testplugin.helpers.util"])
+
+        report = plugins.unload()
+
+        self.assertEqual(
+            report["modules"],
+            [
+                "testplugin",
+                "testplugin.a",
+                "testplugin.helpers",
+                "testplugin.helpers.util",
+            ],
+        )
+        self.assertEqual(len(plugins), 0)
+        self.assertIsNone(module())
+        self.assertIsNone(helper())
+        self.assertIn("testplugin_lib", sys.modules)
+        self.assertGreater(report["collected"], 0)
+        self.assertIsNone(report["memory"])
+
+    def test_lazy(self):
+        plugins = loaders.ModuleLoader(lazy=True).load("testplugin")
+        self.assertNotIn("testplugin.a", sys.modules)
+        [p for p in plugins if p._lazy_name == "testplugin.a"][0].Plugin
+
+        self.assertIn("testplugin.a", plugins.unload()["modules"])
+        self.assertNotIn("testplugin.a", sys.modules)
+
+    def test_classes(self):
+        classes = loaders.ClassLoader().load("testplugin")
+        cls = weakref.ref(classes[0])
+        classes.unload()
+
+        self.assertIsNone(cls())
+        self.assertNotIn("testplugin.a", sys.modules)
+
+    def test_preloaded_kept(self):
+        importlib.import_module("testplugin.a")
+        plugins = loaders.ModuleLoader().load("testplugin")
+
+        self.assertEqual(plugins.unload()["modules"], [])
+        self.assertIn("testplugin.a", sys.modules)
+
+    def test_memory(self):
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        plugins = loaders.unified_load("testplugin", subclasses=object)
+        self.assertTrue(plugins.unload()["memory"] > 0)
+
+        self.assertIsNot(loaders.unified_load("testplugin", subclasses=object), plugins)
+        loaders.unified_load.cache_clear()
+
+
+class ImportFailureTestCase(TemporaryPackageMixin, unittest.TestCase):
+    def setUp(self):
+        super(ImportFailureTestCase, self).setUp()
+        self.write("testplugin/__init__.py", "")
+        self.write("testplugin/good.py", "def do(x):\n    return x + 1\n")
+        self.write("testplugin/broken.py", "import testplugin_missing_dependency\n")
+        self.addCleanup(loaders.clear_import_failures)
+
+    def imports(self, **kwargs):
+        with mock.patch.object(
+            loaders, "import_module", wraps=importlib.import_module
+        ) as import_module:
+            plugins = loaders.ModuleLoader(**kwargs).load("testplugin")
+        names = [c[0][0] for c in import_module.call_args_list]
+        return plugins, names
+
+    def test_errors(self):
+        plugins, names = self.imports()
+
+        self.assertEqual([p.__name__ for p in plugins], ["testplugin.good"])
+        self.assertIn("testplugin.broken", names)
+        [failure] = plugins.errors
+        self.assertEqual(failure.module, "testplugin.broken")
+        self.assertTrue(failure.origin.endswith("broken.py"))
+        self.assertTrue(isinstance(failure.error, ImportError))
+        self.assertIn("testplugin_missing_dependency", failure.traceback)
+
+    def test_lazy(self):
+        plugins = loaders.ModuleLoader(lazy=True).load("testplugin")
+        self.assertEqual(len(plugins), 2)
+        self.assertEqual(plugins.errors, [])
+
+        self.assertEqual(list(plugins.call("do", 1)), [2])
+        self.assertEqual(list(plugins.hook("do")(1)), [2])
+        [failure] = plugins.errors
+        self.assertEqual(failure.module, "testplugin.broken")
+
+    def test_lazy_shared(self):
+        context = loaders.DiscoveryContext()
+        first = loaders.ModuleLoader(lazy=True, context=context).load("testplugin")
+        plugins = loaders.ModuleLoader(lazy=True, context=context).load("testplugin")
+
+        self.assertEqual(list(first.call("do", 1)), [2])
+        self.assertEqual(first.errors[0].module, "testplugin.broken")
+        self.assertEqual(plugins.errors, [])
+
+    def test_not_retried(self):
+        self.imports()
+        for kwargs in ({}, {"lazy": True}, {"workers": 2}):
+            plugins, names = self.imports(**kwargs)
+
+            self.assertNotIn("testplugin.broken", names)
+            self.assertEqual(len(plugins), 1)
+            self.assertEqual(plugins.errors[0].module, "testplugin.broken")
+
+    def test_collector(self):
+        self.imports()
+        collector = loaders.LoadCollector()
+        plugins = loaders.ModuleLoader(collector=collector).load("testplugin")
+
+        self.assertEqual(
+            [f["module"] for f in collector.failures], ["testplugin.broken"]
+        )
+        self.assertEqual(plugins.errors[0].module, "testplugin.broken")
+
+    def test_retried_when_cleared(self):
+        plugins, names = self.imports()
+        loaders.clear_import_failures()
+        self.assertIn("testplugin.broken", self.imports()[1])
+
+        plugins.unload()
+        self.assertIn("testplugin.broken", self.imports()[1])
+
+    def test_retried_when_changed(self):
+        self.imports()
+        self.write("testplugin/broken.py", "def do(x):\n    return x + 2\n")
+        plugins, names = self.imports()
+
+        self.assertIn("testplugin.broken", names)
+        self.assertEqual(len(plugins), 2)
+        self.assertEqual(plugins.errors, [])
+
+    def test_reload(self):
+        plugins = loaders.ModuleLoader().load("testplugin")
+        self.write("testplugin/broken.py", "def do(x):\n    return x + 2\n")
+        plugins.reload()
+
+        self.assertEqual(len(plugins), 2)
+        self.assertEqual(plugins.errors, [])
+
+    def test_strict(self):
+        with self.assertRaises(loaders.PluginImportError) as raised:
+            loaders.ClassLoader(strict=True).load("testplugin")
+        self.assertEqual(raised.exception.errors[0].module, "testplugin.broken")
+
+        with self.assertRaises(ImportError):
+            loaders.unified_load("testplugin", strict=True)
+
+
+class UnifiedLoadCacheTestCase(LoaderTestCaseMixin, unittest.TestCase):
+
+    paths = (
+        os.path.join(os.path.dirname(__file__), "test-packages", "some-test-plugins"),
+    )
+
+    def setUp(self):
+        loaders.unified_load.cache_clear()
+        self.addCleanup(loaders.unified_load.cache_clear)
+        super(UnifiedLoadCacheTestCase, self).setUp()
+
+    def test_hit(self):
+        plugins = loaders.unified_load("testplugin")
+
+        self.assertIs(loaders.unified_load("testplugin"), plugins)
+        hits, misses, maxsize, currsize = loaders.unified_load.cache_info()[:4]
+        self.assertEqual((hits, misses, currsize), (1, 1, 1))
+
+    def test_sys_path_change(self):
+        self.assertEqual(len(loaders.unified_load("testplugin")), 1)
+        more = os.path.join(
+            os.path.dirname(__file__), "test-packages", "more-test-plugins"
+        )
+        sys.path.append(more)
+        try:
+            del sys.modules["testplugin"]
+            self.assertEqual(len(loaders.unified_load("testplugin")), 2)
+        finally:
+            sys.path.remove(more)
+        self.assertEqual(loaders.unified_load.cache_info().rebuilds, 1)
+
+    def test_invalidate_namespace(self):
+        plugins = loaders.unified_load("testplugin")
+        classes = loaders.unified_load("testplugin", subclasses=object)
+        other = loaders.unified_load("testplugin_other")
+
+        loaders.unified_load.cache.invalidate("testplugin")
+
+        self.assertIsNot(loaders.unified_load("testplugin"), plugins)
+        self.assertIsNot(loaders.unified_load("testplugin", subclasses=object), classes)
+        self.assertIs(loaders.unified_load("testplugin_other"), other)
+
+    def test_maxsize(self):
+        cache = loaders.unified_load.cache
+        self.addCleanup(setattr, cache, "maxsize", cache.maxsize)
+        cache.maxsize = 1
+
+        plugins = loaders.unified_load("testplugin")
+        loaders.unified_load("testplugin", recurse=True)
+
+        self.assertEqual(cache.info().currsize, 1)
+        self.assertIsNot(loaders.unified_load("testplugin"), plugins)
+
+
+class FanoutTestCase(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+
+        def slow(x):
+            self.release.wait(5)
+            return x + 1
+
+        def fast(x):
+            return x + 2
+
+        def broken(x):
+            raise KeyError(x)
+
+        self.slow = SimpleNamespace(x=slow)
+        self.fast = SimpleNamespace(x=fast)
+        self.broken = SimpleNamespace(x=broken)
+        self.addCleanup(self.release.set)
+
+    def test_ordered(self):
+        m = manager.PluginManager([self.slow, SimpleNamespace(), self.fast])
+        results = m.fanout("x", (1,))
+
+        self.release.set()
+        self.assertEqual(list(results), [2, 3])
+
+    def test_as_completed(self):
+        m = manager.PluginManager([self.slow, self.fast])
+        results = m.fanout("x", (1,), ordered=False)
+
+        self.assertEqual(next(results), 3)
+        self.release.set()
+        self.assertEqual(list(results), [2])
+
+    def test_runs_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def meet(x):
+            barrier.wait()
+            return x
+
+        m = manager.PluginManager([SimpleNamespace(x=meet)] * 3)
+        self.assertEqual(list(m.fanout("x", (1,))), [1, 1, 1])
+
+    def test_error_raised(self):
+        m = manager.PluginManager([self.fast, self.broken])
+        with self.assertRaises(KeyError):
+            list(m.fanout("x", (1,)))
+
+    def test_errors_collected(self):
+        m = manager.PluginManager([self.broken, self.fast])
+        results = list(m.fanout("x", (1,), collect_errors=True))
+
+        self.assertEqual(results[0].plugin, self.broken)
+        self.assertTrue(isinstance(results[0].error, KeyError))
+        self.assertEqual(results[1], manager.PluginResult(self.fast, 3, None))
+
+    def test_timeout(self):
+        m = manager.PluginManager([self.slow, self.fast])
+        for ordered in (True, False):
+            results = m.fanout(
+                "x", (1,), timeout=0.05, collect_errors=True, ordered=ordered
+            )
+            errors = dict((id(r.plugin), r.error) for r in results)
+
+            self.assertTrue(isinstance(errors[id(self.slow)], futures.TimeoutError))
+            self.assertIsNone(errors[id(self.fast)])
+
+    def test_timeout_per_plugin(self):
+        def sleep(x):
+            time.sleep(0.1)
+            return x
+
+        m = manager.PluginManager([SimpleNamespace(x=sleep)] * 3)
+        for ordered in (True, False):
+            with ThreadPoolExecutor(1) as executor:
+                results = m.fanout(
+                    "x", (1,), executor=executor, timeout=0.25, ordered=ordered
+                )
+                self.assertEqual(list(results), [1, 1, 1])
+
+    def test_timeout_waiting_to_start(self):
+        executor = ThreadPoolExecutor(1)
+        self.addCleanup(executor.shutdown)
+        # Cleanups run last first, so the stuck plugin is released first
+        self.addCleanup(self.release.set)
+        m = manager.PluginManager([self.slow, self.fast])
+        for ordered in (True, False):
+            start = time.monotonic()
+            results = m.fanout(
+                "x",
+                (1,),
+                executor=executor,
+                timeout=0.1,
+                ordered=ordered,
+                collect_errors=True,
+            )
+            errors = [r.error for r in results]
+
+            self.assertLess(time.monotonic() - start, 1)
+            self.assertEqual(
+                [type(e) for e in errors], [futures.TimeoutError] * 2, errors
+            )
+
+    def test_executor(self):
+        m = manager.PluginManager([self.fast, self.fast])
+        with ThreadPoolExecutor(1) as executor:
+            self.assertEqual(list(m.fanout("x", (1,), executor=executor)), [3, 3])
+
+
+class SelectTestCase(unittest.TestCase):
+    def setUp(self):
+        def plugin(name, **meta):
+            return SimpleNamespace(name=name, __plugin__=SimpleNamespace(**meta))
+
+        self.m = manager.PluginManager(
+            [
+                plugin("a", priority=2, provides="x", tags=["fast"]),
+                plugin("b", priority=1, provides="y"),
+                plugin("c", priority="high", provides="x"),
+                plugin("d", provides="x", tags=["slow"]),
+                SimpleNamespace(name="e", run=len),
+            ]
+        )
+
+    def names(self, plugins):
+        return [p.name for p in plugins]
+
+    def test_exact(self):
+        self.assertEqual(self.names(self.m.select(provides="x")), ["a", "c", "d"])
+        self.assertEqual(self.names(self.m.select(provides__exact="y")), ["b"])
+        self.assertEqual(self.names(self.m.select(tags=["slow"])), ["d"])
+
+    def test_comparisons(self):
+        self.assertEqual(self.names(self.m.select(priority__gt=1)), ["a"])
+        self.assertEqual(self.names(self.m.select(priority__ge=1)), ["a", "b"])
+        self.assertEqual(self.names(self.m.select(priority__lt=2)), ["b"])
+        self.assertEqual(self.names(self.m.select(priority__le=2)), ["a", "b"])
+        self.assertEqual(self.names(self.m.select(priority__ne=1)), ["a", "c"])
+        self.assertEqual(
+            self.names(self.m.select(priority__in=(1, "high"))), ["b", "c"]
+        )
+        self.assertEqual(self.names(self.m.select(tags__contains="fast")), ["a"])
+
+    def test_combined(self):
+        selected = self.m.select(provides="x", priority__ge=0)
+
+        self.assertEqual(self.names(selected), ["a"])
+        self.assertEqual(self.names(self.m.select()), list("abcde"))
+
+    def test_implementing(self):
+        self.assertEqual(self.names(self.m.implementing("run")), ["e"])
+        self.assertEqual(len(self.m.implementing("missing")), 0)
+
+    def test_indexed_once(self):
+        self.m.select(provides="x")
+        self.m._plugins[0].__plugin__.provides = "y"
+        self.assertEqual(self.names(self.m.select(provides="x")), ["a", "c", "d"])
+
+        self.m._plugins = list(self.m._plugins)
+        self.assertEqual(self.names(self.m.select(provides="x")), ["c", "d"])
+
+
+class PipeStreamTestCase(unittest.TestCase):
+    def setUp(self):
+        def double(x, step=1):
+            return x * 2
+
+        def odd_only(x, step=1):
+            return x + step if x % 2 else None
+
+        def odd_only_batch(xs, step=1):
+            self.batches.append(list(xs))
+            return [x + step if x % 2 else None for x in xs]
+
+        self.batches = []
+        self.plugins = [
+            SimpleNamespace(x=double),
+            SimpleNamespace(),
+            SimpleNamespace(
+                x=odd_only,
+                x_batch=odd_only_batch,
+                __plugin__=SimpleNamespace(batch={"x": "x_batch"}),
+            ),
+        ]
+
+    def test_same_as_pipe(self):
+        for plugins in (self.plugins, self.plugins[::-1], self.plugins[1:2], []):
+            m = manager.PluginManager(plugins)
+            expected = [m.pipe("x", i, step=3) for i in range(10)]
+
+            self.assertEqual(list(m.pipe_stream("x", range(10), step=3)), expected)
+
+    def test_batches(self):
+        m = manager.PluginManager(self.plugins[::-1])
+        results = m.pipe_stream("x", iter(range(5)), chunksize=2)
+
+        self.assertEqual(self.batches, [])
+        self.assertEqual(list(results), [0, 4, 4, 8, 8])
+        self.assertEqual(self.batches, [[0, 1], [2, 3], [4]])
+
+    def test_batch_needs_method(self):
+        del self.plugins[2].x
+        m = manager.PluginManager(self.plugins)
+
+        self.assertEqual(list(m.pipe_stream("x", [1, 2])), [2, 4])
+        self.assertEqual(self.batches, [])
+
+    def test_batch_length_checked(self):
+        self.plugins[2].x_batch = lambda xs: xs[1:]
+        m = manager.PluginManager(self.plugins)
+
+        with self.assertRaises(ValueError):
+            list(m.pipe_stream("x", [1, 2]))
+
+
+class ProcessPluginManagerTestCase(TemporaryPackageMixin, unittest.TestCase):
+    def setUp(self):
+        super(ProcessPluginManagerTestCase, self).setUp()
+        self.write("testplugin_proc/__init__.py", "")
+        self.write(
+            "testplugin_proc/a.py",
+            "import os\n\n\n"
+            "class __plugin__:\n    priority = 1\n\n\n"
+            "def do(x):\n    return x * 10\n\n\n"
+            "def pid():\n    return os.getpid()\n\n\n"
+            "def crash():\n    os._exit(3)\n",
+        )
+        self.write(
+            "testplugin_proc/b.py",
+            "def do(x):\n    return x + 1\n\n\ndef fail():\n    1 / 0\n",
+        )
+        self.write(
+            "testplugin_proc/c.py",
+            "class __plugin__:\n    priority = 0.5\n\n\n"
+            "def do(x):\n    return None\n",
+        )
+        self.plugins = workers.ProcessPluginManager("testplugin_proc", processes=2)
+        self.addCleanup(self.plugins.close)
+
+    def test_same_as_in_process(self):
+        local = loaders.ModuleLoader().load("testplugin_proc")
+
+        self.assertEqual(len(self.plugins), 3)
+        self.assertEqual(list(self.plugins.call("do", 2)), list(local.call("do", 2)))
+        self.assertEqual(self.plugins.first("do", 2), local.first("do", 2))
+        self.assertEqual(self.plugins.pipe("do", 2), local.pipe("do", 2))
+
+    def test_not_in_host(self):
+        self.assertNotIn("testplugin_proc.a", sys.modules)
+        self.assertNotEqual(self.plugins.first("pid"), os.getpid())
+
+    def test_error(self):
+        with self.assertRaises(ZeroDivisionError):
+            list(self.plugins.call("fail"))
+        self.assertEqual(list(self.plugins.call("do", 1)), [10, None, 2])
+
+    def test_crash(self):
+        with self.assertRaises(workers.WorkerError):
+            self.plugins.first("crash")
+        self.assertEqual(list(self.plugins.call("do", 1)), [10, None, 2])
+        self.assertEqual(self.plugins.pipe("do", 1), 11)
+
+
+class AsyncPluginManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.running = 0
+        self.most_running = 0
+        self.cancelled = []
+
+        def sync(x):
+            return x + 1
+
+        async def slow(x, result=None):
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+            try:
+                await asyncio.sleep(0.01)
+            except asyncio.CancelledError:
+                self.cancelled.append(x)
+                raise
+            finally:
+                self.running -= 1
+            return x + 2 if result is None else result
+
+        async def none(x):
+            return None
+
+        self.m = manager.PluginManager(
+            [
+                SimpleNamespace(x=slow, y=none),
+                SimpleNamespace(x=sync, y=none),
+                SimpleNamespace(y=slow),
+                SimpleNamespace(x=slow, y=slow),
+            ]
+        )
+
+    def complete(self, coroutine):
+        # asyncio.run() needs Python 3.7
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def collect(self, agen):
+        async def run():
+            return [r async for r in agen]
+
+        return self.complete(run())
+
+    def test_acall(self):
+        self.assertEqual(self.collect(self.m.acall("x", 1)), [3, 2, 3])
+        self.assertEqual(self.most_running, 1)
+
+    def test_acall_concurrently(self):
+        results = self.collect(self.m.acall("y", 1, concurrency=True))
+
+        self.assertEqual(results, [None, None, 3, 3])
+        self.assertEqual(self.most_running, 2)
+
+    def test_acall_concurrency_limit(self):
+        plugins = manager.PluginManager([self.m[0]] * 5)
+        results = self.collect(plugins.acall("x", 1, concurrency=2))
+
+        self.assertEqual(results, [3] * 5)
+        self.assertEqual(self.most_running, 2)
+
+    def test_afirst(self):
+        self.assertEqual(self.complete(self.m.afirst("y", 1)), 3)
+
+    def test_afirst_cancels_the_rest(self):
+        async def fast(x):
+            return "fast"
+
+        plugins = manager.PluginManager([SimpleNamespace(x=fast), self.m[0], self.m[0]])
+
+        result = self.complete(plugins.afirst("x", 1, concurrency=True))
+
+        self.assertEqual(result, "fast")
+        self.assertEqual(self.cancelled, [1, 1])
+
+    def test_afirst_none(self):
+        plugins = manager.PluginManager([self.m[0], self.m[1]])
+        with self.assertRaises(ValueError):
+            self.complete(plugins.afirst("y", 1))
+
+    def test_apipe(self):
+        self.assertEqual(self.complete(self.m.apipe("x", 1)), 6)
+
+
+class LoadCollectorTestCase(TemporaryPackageMixin, unittest.TestCase):
+    paths = (
+        os.path.join(
+            os.path.dirname(__file__), "test-packages", "package-test-plugins"
+        ),
+    )
+
+    def setUp(self):
+        super(LoadCollectorTestCase, self).setUp()
+        self.write("testplugin/broken.py", "import testplugin_does_not_exist\n")
+
+    def test_report(self):
+        collector = loaders.LoadCollector()
+        plugins = loaders.ModuleLoader(collector=collector).load("testplugin")
+        report = collector.report()
+
+        self.assertEqual(len(plugins), 3)
+        self.assertEqual(
+            [scan["location"] for scan in report["scans"]],
+            list(sys.modules["testplugin"].__path__),
+        )
+        imported = dict((i["module"], i) for i in report["imports"])
+        self.assertEqual(
+            set(imported), set(("testplugin.foo", "testplugin.bar", "testplugin.baz"))
+        )
+        self.assertEqual(imported["testplugin.foo"]["new_modules"], ["testplugin.foo"])
+        self.assertEqual(
+            [f["module"] for f in report["failures"]], ["testplugin.broken"]
+        )
+        self.assertEqual(
+            set(report["steps"]),
+            set(
+                (
+                    "ModuleLoader.fill_cache",
+                    "ModuleLoader.post_fill",
+                    "ModuleLoader.order",
+                    "ModuleLoader.resolve",
+                )
+            ),
+        )
+
+    def test_workers(self):
+        for name in ("slow_a", "slow_b"):
+            self.write("testplugin/%s.py" % name, "import time\ntime.sleep(0.05)\n")
+        collector = loaders.LoadCollector()
+        loaders.ModuleLoader(workers=5, collector=collector).load("testplugin")
+
+        for item in collector.report()["imports"]:
+            self.assertEqual(
+                [m for m in item["new_modules"] if m.startswith("testplugin.")],
+                [item["module"]],
+            )
+
+
 class PluginManagerTestCase(unittest.TestCase):
     def setUp(self):
         self.m = manager.PluginManager([mock.Mock(), mock.Mock()])
@@ -269,6 +1813,34 @@ class PluginManagerTestCase(unittest.TestCase):
         self.assertTrue(self.m._plugins[0].called_with("a"))
         self.assertTrue(self.m._plugins[1].x.called_with(1))
 
+    def test_hook(self):
+        plugins = [mock.Mock(), mock.Mock(spec=[]), mock.Mock()]
+        plugins[0].x.return_value = None
+        plugins[2].x.return_value = 2
+        m = manager.PluginManager(plugins)
+        hook = m.hook("x")
+
+        self.assertIs(m.hook("x"), hook)
+        self.assertEqual(hook(1), [None, 2])
+        self.assertEqual(hook.first(1), 2)
+        plugins[0].x.assert_called_with(1)
+
+    def test_hook_pipe(self):
+        def plus_one(x):
+            return x + 1
+
+        self.m._plugins[0].x.side_effect = plus_one
+        self.m._plugins[1].x.side_effect = plus_one
+        self.assertEqual(3, self.m.hook("x").pipe(1))
+
+    def test_hook_sees_replaced_plugins(self):
+        hook = self.m.hook("x")
+        self.assertEqual(len(hook()), 2)
+
+        self.m._plugins = self.m._plugins + [mock.Mock()]
+
+        self.assertEqual(len(hook()), 3)
+
     def test_produce(self):
         products = self.m.produce(1, 2)
         assert products[0] is self.m._plugins[0].return_value